@@ -3,3 +3,5 @@ This is an XBlock that accepts a free-text response from students.
 Instructors can specify a list of phrases, of which one must be
 present in order for the student to receive credit.
 """
+
+default_app_config = 'freetextresponse.apps.FreeTextResponseConfig'
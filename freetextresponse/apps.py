@@ -0,0 +1,21 @@
+"""
+Django app configuration for the XBlock
+"""
+from __future__ import absolute_import
+
+from django.apps import AppConfig
+
+from .parallel import start_worker_pool
+
+
+class FreeTextResponseConfig(AppConfig):
+    """
+    Start the scoring pool once Django has loaded its settings
+    """
+    name = 'freetextresponse'
+
+    def ready(self):
+        """
+        Start the scoring pool before any request thread exists
+        """
+        start_worker_pool()
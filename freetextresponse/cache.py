@@ -0,0 +1,61 @@
+"""
+Bounded in-process caches
+"""
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import threading
+
+
+class LRUCache(object):
+    """
+    A thread-safe mapping that evicts its least recently used items
+
+    Python 2 has no functools.lru_cache, and the caches here are keyed
+    by data rather than by function arguments anyway.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        """
+        Return the item stored under key, marking it recently used
+        """
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                return default
+            self._items[key] = value
+            return value
+
+    def set(self, key, value):
+        """
+        Store an item, evicting the least recently used ones over
+        max_size
+        """
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def discard(self, key):
+        """
+        Remove the item stored under key, if any
+        """
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        """
+        Remove every item
+        """
+        with self._lock:
+            self._items.clear()
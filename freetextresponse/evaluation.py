@@ -0,0 +1,204 @@
+"""
+Evaluate a student answer against a block's grading settings
+"""
+from __future__ import absolute_import
+
+from collections import namedtuple
+
+from .instrumentation import observe
+from .instrumentation import timer
+from .models import Credit
+from .models import KeyphraseMatching
+from .parallel import determine_credit
+from .wordcount import count_words
+
+
+GRADING_SETTINGS = (
+    'min_word_count',
+    'max_word_count',
+    'fullcredit_keyphrases',
+    'halfcredit_keyphrases',
+    'keyphrase_matching',
+)
+
+Grade = namedtuple('Grade', ['word_count', 'word_count_valid', 'credit'])
+
+
+class Evaluation(object):
+    """
+    The grading facts about one answer under one set of settings
+
+    Each value is computed on first use and then reused, so the
+    handlers and view helpers can ask for them as often as they like.
+    """
+
+    def __init__(
+            self,
+            answer,
+            min_word_count,
+            max_word_count,
+            fullcredit_keyphrases,
+            halfcredit_keyphrases,
+            keyphrase_matching=KeyphraseMatching.exact.value,
+    ):
+        self.answer = answer
+        self.min_word_count = min_word_count
+        self.max_word_count = max_word_count
+        self.fullcredit_keyphrases = tuple(fullcredit_keyphrases)
+        self.halfcredit_keyphrases = tuple(halfcredit_keyphrases)
+        self.keyphrase_matching = keyphrase_matching
+        self._word_count = None
+        self._keyphrase_credit = None
+
+    @property
+    def key(self):
+        """
+        Identify the inputs this evaluation was computed from
+        """
+        return evaluation_key(
+            self.answer,
+            self.min_word_count,
+            self.max_word_count,
+            self.fullcredit_keyphrases,
+            self.halfcredit_keyphrases,
+            self.keyphrase_matching,
+        )
+
+    @property
+    def word_count(self):
+        """
+        The number of words in the answer
+
+        Counting stops once max_word_count is exceeded, so longer
+        answers report max_word_count + 1.
+        """
+        if self._word_count is None:
+            with timer('word_count'):
+                self._word_count = count_words(
+                    self.answer,
+                    limit=self.max_word_count,
+                )
+            observe('answer_words', self._word_count)
+        return self._word_count
+
+    @property
+    def word_count_valid(self):
+        """
+        Whether the word count is within the configured bounds
+        """
+        word_count = self.word_count
+        result = self.max_word_count >= word_count >= self.min_word_count
+        return result
+
+    @property
+    def keyphrase_credit(self):
+        """
+        The credit earned by key phrases alone, ignoring word count
+        """
+        if self._keyphrase_credit is None:
+            if not self.fullcredit_keyphrases \
+                    and not self.halfcredit_keyphrases:
+                result = Credit.full
+            else:
+                with timer('determine_credit'):
+                    result = determine_credit(
+                        self.fullcredit_keyphrases,
+                        self.halfcredit_keyphrases,
+                        self.answer,
+                        self.keyphrase_matching,
+                    )
+                observe('answer_characters', len(self.answer))
+                observe(
+                    'keyphrases',
+                    len(self.fullcredit_keyphrases) +
+                    len(self.halfcredit_keyphrases),
+                )
+            self._keyphrase_credit = result
+        return self._keyphrase_credit
+
+    @property
+    def credit(self):
+        """
+        The credit earned by the answer
+        """
+        if self.answer == '' or not self.word_count_valid:
+            result = Credit.zero
+        else:
+            result = self.keyphrase_credit
+        return result
+
+
+def evaluation_key(
+        answer,
+        min_word_count,
+        max_word_count,
+        fullcredit_keyphrases,
+        halfcredit_keyphrases,
+        keyphrase_matching=KeyphraseMatching.exact.value,
+):
+    """
+    Build the cache key for an Evaluation of these inputs
+    """
+    return (
+        answer,
+        min_word_count,
+        max_word_count,
+        tuple(fullcredit_keyphrases),
+        tuple(halfcredit_keyphrases),
+        keyphrase_matching,
+    )
+
+
+def get_grading_settings(block):
+    """
+    Extract the settings that grading depends on from a block
+
+    The result is a plain dict, so it can be stored or sent to
+    worker processes.
+    """
+    return dict(
+        (name, getattr(block, name))
+        for name in GRADING_SETTINGS
+    )
+
+
+def grade_answers(settings, answers):
+    """
+    Grade many answers under one set of grading settings
+
+    settings is a dict as returned by get_grading_settings. Yields a
+    Grade per answer, in order, without creating any XBlock or
+    runtime, so it can be used by regrades, imports and analytics.
+    """
+    min_word_count = settings['min_word_count']
+    max_word_count = settings['max_word_count']
+    fullcredit_keyphrases = tuple(settings['fullcredit_keyphrases'])
+    halfcredit_keyphrases = tuple(settings['halfcredit_keyphrases'])
+    keyphrase_matching = settings.get(
+        'keyphrase_matching',
+        KeyphraseMatching.exact.value,
+    )
+    for answer in answers:
+        evaluation = Evaluation(
+            answer,
+            min_word_count,
+            max_word_count,
+            fullcredit_keyphrases,
+            halfcredit_keyphrases,
+            keyphrase_matching,
+        )
+        yield Grade(
+            evaluation.word_count,
+            evaluation.word_count_valid,
+            evaluation.credit,
+        )
+
+
+def grade_batch(settings, answers):
+    """
+    Grade a batch of answers, returning a list of Grades
+
+    A module-level, picklable entry point for process pools, e.g.
+    pool.imap(functools.partial(grade_batch, settings), batches).
+    """
+    return list(grade_answers(settings, answers))
@@ -0,0 +1,128 @@
+"""
+Export stored answers to a Free-text Response block
+"""
+from __future__ import absolute_import
+
+import csv
+import json
+
+import six
+from six import text_type
+
+from .fields import decompress_text
+
+
+EXPORT_FIELDS = (
+    'user_id',
+    'username',
+    'student_answer',
+    'score',
+    'count_attempts',
+)
+EXPORT_FORMATS = ('csv', 'jsonl')
+# Spreadsheets run cells starting with these as formulas
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@')
+
+
+class _Line(object):
+    # pylint: disable=too-few-public-methods
+    """
+    A file-like object that hands back what is written to it, so the
+    csv module can format one row at a time
+    """
+
+    @staticmethod
+    def write(value):
+        """
+        Return the formatted row
+        """
+        return value
+
+
+def iter_records(rows):
+    """
+    Yield an export record for each (user_id, username, state) row
+
+    state is the block's user_state as a dict; learners who never
+    answered export an empty answer.
+    """
+    for user_id, username, state in rows:
+        yield {
+            'user_id': user_id,
+            'username': username,
+            'student_answer': decompress_text(
+                state.get('student_answer', ''),
+            ),
+            'score': state.get('score', 0.0),
+            'count_attempts': state.get('count_attempts', 0),
+        }
+
+
+def iter_csv_lines(records):
+    """
+    Yield the lines of a CSV export, header first
+    """
+    writer = csv.writer(_Line())
+    yield _format_csv_row(writer, EXPORT_FIELDS)
+    for record in records:
+        yield _format_csv_row(
+            writer,
+            [record[field] for field in EXPORT_FIELDS],
+        )
+
+
+def _escape_csv_value(value):
+    """
+    Return value as a spreadsheet will show it, rather than evaluate it
+
+    Text that would be read as a formula is prefixed with a quote.
+    """
+    if isinstance(value, six.string_types) and \
+            value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _format_csv_row(writer, values):
+    """
+    Return one CSV row as text
+    """
+    values = [_escape_csv_value(value) for value in values]
+    if six.PY2:  # pragma: no cover
+        values = [text_type(value).encode('utf-8') for value in values]
+        return writer.writerow(values).decode('utf-8')
+    return writer.writerow(values)
+
+
+def iter_jsonl_lines(records):
+    """
+    Yield the lines of a JSON Lines export, one object per record
+    """
+    for record in records:
+        yield json.dumps(record, sort_keys=True) + '\n'
+
+
+def iter_export_lines(records, export_format):
+    """
+    Yield the lines of an export in the given format
+    """
+    if export_format == 'csv':
+        return iter_csv_lines(records)
+    if export_format == 'jsonl':
+        return iter_jsonl_lines(records)
+    raise ValueError('Unknown export format: {}'.format(export_format))
+
+
+def write_lines(lines, output):
+    """
+    Write lines to a binary stream as UTF-8, returning how many were
+    written
+
+    Lines are written as they are produced, so an export never holds
+    more than one record in memory.
+    """
+    count = 0
+    for line in lines:
+        output.write(line.encode('utf-8'))
+        count += 1
+    return count
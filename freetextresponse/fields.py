@@ -0,0 +1,162 @@
+"""
+Store long answers compressed
+
+Compression is off unless the FREETEXTRESPONSE_COMPRESS_ANSWERS_ABOVE
+Django setting gives a size in bytes; answers at least that long are
+then stored as zlib-compressed, base64-encoded text, in a dict so they
+can never be mistaken for a plain answer. Stored values of either form
+are always read back, whatever the setting is now.
+"""
+from __future__ import absolute_import
+
+import base64
+import zlib
+
+from django.conf import settings
+from six import text_type
+from xblock.fields import String
+
+from .instrumentation import incr
+
+
+COMPRESSION_LEVEL = 6
+COMPRESSED_KEY = 'zlib'
+
+
+def get_compression_min_bytes():
+    """
+    Returns the size from which answers are stored compressed, or None
+    when compression is off
+    """
+    result = getattr(
+        settings,
+        'FREETEXTRESPONSE_COMPRESS_ANSWERS_ABOVE',
+        None,
+    ) or None
+    return result
+
+
+def compress_text(text, min_bytes=None):
+    """
+    Returns the stored form of text
+
+    Text shorter than min_bytes once encoded, or any text when no size
+    is given, is stored as is.
+    """
+    if min_bytes is None or not isinstance(text, text_type):
+        return text
+    encoded = text.encode('utf-8')
+    if len(encoded) < min_bytes:
+        return text
+    data = base64.b64encode(zlib.compress(encoded, COMPRESSION_LEVEL))
+    incr('answers_compressed')
+    result = {COMPRESSED_KEY: data.decode('ascii')}
+    return result
+
+
+def is_compressed(value):
+    """
+    Returns whether a stored value holds compressed text
+    """
+    return isinstance(value, dict) and COMPRESSED_KEY in value
+
+
+def decompress_text(value):
+    """
+    Returns the text held by a stored value, of either form
+    """
+    if not is_compressed(value):
+        return value
+    data = base64.b64decode(value[COMPRESSED_KEY].encode('ascii'))
+    result = zlib.decompress(data).decode('utf-8')
+    return result
+
+
+class CompressedText(object):
+    """
+    Compressed text held in memory, inflated only when read
+    """
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __eq__(self, other):
+        if not isinstance(other, CompressedText):
+            return NotImplemented
+        return self.data == other.data
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash(self.data)
+
+    def __repr__(self):
+        return 'CompressedText({!r})'.format(self.data)
+
+    @property
+    def text(self):
+        """
+        The inflated text
+        """
+        return decompress_text(self.to_json())
+
+    def to_json(self):
+        """
+        Returns the stored form of the text
+        """
+        return {COMPRESSED_KEY: self.data}
+
+
+def load_text(value):
+    """
+    Returns a stored value as text, or as CompressedText to be inflated
+    later
+    """
+    if is_compressed(value):
+        return CompressedText(value[COMPRESSED_KEY])
+    return value
+
+
+def dump_text(value, min_bytes=None):
+    """
+    Returns the stored form of text or CompressedText
+    """
+    if isinstance(value, CompressedText):
+        return value.to_json()
+    return compress_text(value, min_bytes)
+
+
+def get_text(value):
+    """
+    Returns the text of text or CompressedText
+    """
+    if isinstance(value, CompressedText):
+        return value.text
+    return value
+
+
+class CompressedString(String):
+    """
+    A String field stored compressed once it is long enough
+
+    Values are inflated by from_json, which XBlock calls on the first
+    read of the field, so blocks that never read the text never pay
+    for inflating it.
+    """
+
+    def from_json(self, value):
+        return super(CompressedString, self).from_json(
+            decompress_text(value),
+        )
+
+    def to_json(self, value):
+        return compress_text(
+            super(CompressedString, self).to_json(value),
+            get_compression_min_bytes(),
+        )
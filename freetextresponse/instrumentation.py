@@ -0,0 +1,230 @@
+"""
+Opt-in timing and counters for the XBlock's hot paths
+
+Instrumentation is off until a sink is configured, either with
+configure() or through the FREETEXTRESPONSE_INSTRUMENTATION_SINK
+Django setting (a dotted path to a sink class). While it is off,
+timer() hands back a shared no-op context manager and the other
+helpers return immediately.
+"""
+from __future__ import absolute_import
+
+from collections import defaultdict
+import functools
+import logging
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+LOG = logging.getLogger(__name__)
+PREFIX = 'freetextresponse'
+
+_UNCONFIGURED = object()
+_STATE = {
+    'sink': _UNCONFIGURED,
+}
+
+
+class LoggingSink(object):
+    """
+    Write measurements to a logger
+    """
+
+    def __init__(self, logger=LOG, level=logging.DEBUG):
+        self.logger = logger
+        self.level = level
+
+    def timing(self, name, seconds):
+        """
+        Record how long an operation took
+        """
+        self.logger.log(self.level, '%s took %.3fms', name, seconds * 1000)
+
+    def incr(self, name, value=1):
+        """
+        Add to a counter
+        """
+        self.logger.log(self.level, '%s += %s', name, value)
+
+    def observe(self, name, value):
+        """
+        Record one sample of a distribution, such as an answer size
+        """
+        self.logger.log(self.level, '%s = %s', name, value)
+
+
+class StatsdSink(object):
+    """
+    Send measurements as statsd lines over UDP, to a local agent
+
+    Sending is fire-and-forget; errors are ignored so metrics can
+    never break a request.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix=PREFIX):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, line):
+        """
+        Send one statsd line
+        """
+        try:
+            self._socket.sendto(line.encode('utf-8'), self.address)
+        except (IOError, OSError):
+            pass
+
+    def timing(self, name, seconds):
+        """
+        Record how long an operation took
+        """
+        self.send('{}.{}:{:.3f}|ms'.format(self.prefix, name, seconds * 1000))
+
+    def incr(self, name, value=1):
+        """
+        Add to a counter
+        """
+        self.send('{}.{}:{}|c'.format(self.prefix, name, value))
+
+    def observe(self, name, value):
+        """
+        Record one sample of a distribution, such as an answer size
+        """
+        self.send('{}.{}:{}|h'.format(self.prefix, name, value))
+
+
+class MemorySink(object):
+    """
+    Keep measurements in memory, for tests
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.counters = defaultdict(int)
+        self.observations = defaultdict(list)
+
+    def timing(self, name, seconds):
+        """
+        Record how long an operation took
+        """
+        with self._lock:
+            self.timings[name].append(seconds)
+
+    def incr(self, name, value=1):
+        """
+        Add to a counter
+        """
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, name, value):
+        """
+        Record one sample of a distribution, such as an answer size
+        """
+        with self._lock:
+            self.observations[name].append(value)
+
+
+class _Timer(object):
+    """
+    Time the enclosed block and report it to a sink
+    """
+
+    def __init__(self, sink, name):
+        self.sink = sink
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.sink.timing(self.name, time.time() - self.start)
+
+
+class _NullTimer(object):
+    """
+    A reusable context manager that does nothing
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def configure(sink):
+    """
+    Send measurements to sink; None turns instrumentation off
+    """
+    _STATE['sink'] = sink
+
+
+def get_sink():
+    """
+    Return the configured sink, or None when instrumentation is off
+    """
+    sink = _STATE['sink']
+    if sink is _UNCONFIGURED:
+        path = getattr(settings, 'FREETEXTRESPONSE_INSTRUMENTATION_SINK', None)
+        sink = import_string(path)() if path else None
+        _STATE['sink'] = sink
+    return sink
+
+
+def timer(name):
+    """
+    Return a context manager that times its block as name
+    """
+    sink = get_sink()
+    if sink is None:
+        return _NULL_TIMER
+    return _Timer(sink, name)
+
+
+def timed(name):
+    """
+    Decorate a function so each call is timed as name
+    """
+    def decorator(function):
+        """
+        Wrap function in a timer
+        """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            """
+            Call the wrapped function inside a timer
+            """
+            with timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def incr(name, value=1):
+    """
+    Add value to the counter called name
+    """
+    sink = get_sink()
+    if sink is not None:
+        sink.incr(name, value)
+
+
+def observe(name, value):
+    """
+    Record value as one sample of the distribution called name
+    """
+    sink = get_sink()
+    if sink is not None:
+        sink.observe(name, value)
@@ -0,0 +1,562 @@
+"""
+Match student answers against the configured key phrases
+"""
+from __future__ import absolute_import
+
+from collections import deque
+import re
+import unicodedata
+
+from six import text_type
+
+from .cache import LRUCache
+from .models import Credit
+from .models import KeyphraseMatching
+
+
+# Below this many phrases, a C-level substring scan per phrase is
+# cheaper than walking the answer through the automaton in Python.
+AUTOMATON_MIN_PHRASES = 200
+MATCHER_CACHE_SIZE = 128
+# Tolerant matching forgives at most this many typos per word
+MAX_EDIT_DISTANCE = 2
+# Answer words whose matches a FuzzyMatcher remembers
+WORD_MATCH_CACHE_SIZE = 50000
+# New answer words a FuzzyMatcher checks for typos per answer; the rest
+# of the answer's new words must match a phrase word exactly.
+FUZZY_WORDS_PER_ANSWER = 100
+
+_FULL = 2
+_HALF = 1
+_MATCHERS = LRUCache(MATCHER_CACHE_SIZE)
+
+# The Combining Diacritical Marks blocks, left behind as separate
+# characters once accented letters are decomposed
+_ACCENTS = re.compile(
+    u'[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]'
+)
+# Hyphens and apostrophes within a word; the lookbehind comes after
+# the character set so the scan can skip ahead to candidates.
+_JOINERS = re.compile(u"[-'\u2010\u2011\u2019](?<=\\w.)(?=\\w)", re.UNICODE)
+_WORDS = re.compile(r'\w+', re.UNICODE)
+# (suffix, replacement) pairs tried in order by stem()
+_SUFFIXES = (
+    ('ies', 'y'),
+    ('ing', ''),
+    ('ed', ''),
+    ('s', ''),
+)
+_STEM_MIN_LENGTH = 3
+
+
+class KeyphraseMatcher(object):
+    """
+    Score an answer against full- and half-credit key phrases
+
+    The phrases are compiled into a single Aho-Corasick automaton, so
+    an answer is scanned once, left to right, no matter how many
+    phrases are configured. Transitions are resolved lazily and
+    memoized, so the automaton converges towards a DFA over the
+    characters that actually appear in answers.
+    """
+
+    def __init__(self, fullcredit_keyphrases, halfcredit_keyphrases):
+        self.fullcredit_keyphrases = [
+            phrase.lower()
+            for phrase in fullcredit_keyphrases
+        ]
+        self.halfcredit_keyphrases = [
+            phrase.lower()
+            for phrase in halfcredit_keyphrases
+        ]
+        phrase_count = (
+            len(self.fullcredit_keyphrases) +
+            len(self.halfcredit_keyphrases)
+        )
+        self.use_automaton = phrase_count >= AUTOMATON_MIN_PHRASES
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [0]
+        self._delta = [{}]
+        if self.use_automaton:
+            self._build()
+
+    def _add_phrase(self, phrase, flag):
+        """
+        Add a single phrase to the trie underlying the automaton
+        """
+        state = 0
+        for character in phrase:
+            next_state = self._goto[state].get(character)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(0)
+                self._delta.append({})
+                self._goto[state][character] = next_state
+            state = next_state
+        self._output[state] |= flag
+
+    def _build(self):
+        """
+        Compile the phrase lists into the automaton
+        """
+        for phrase in self.halfcredit_keyphrases:
+            self._add_phrase(phrase, _HALF)
+        for phrase in self.fullcredit_keyphrases:
+            self._add_phrase(phrase, _FULL)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and character not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                fallback = self._goto[fallback].get(character, 0)
+                if fallback == next_state:
+                    fallback = 0
+                self._fail[next_state] = fallback
+                self._output[next_state] |= self._output[fallback]
+
+    def _transition(self, state, character):
+        """
+        Resolve (and memoize) the move out of state on character
+        """
+        current = state
+        while True:
+            next_state = self._goto[current].get(character)
+            if next_state is not None:
+                break
+            if not current:
+                next_state = 0
+                break
+            current = self._fail[current]
+        self._delta[state][character] = next_state
+        return next_state
+
+    def _scan(self, answer):
+        """
+        Return the credit flags found in a lower-cased answer
+
+        Stops as soon as a full-credit phrase is found.
+        """
+        found = self._output[0]
+        if found & _FULL:
+            return found
+        delta = self._delta
+        output = self._output
+        state = 0
+        for character in answer:
+            next_state = delta[state].get(character)
+            if next_state is None:
+                next_state = self._transition(state, character)
+            state = next_state
+            if output[state]:
+                found |= output[state]
+                if found & _FULL:
+                    break
+        return found
+
+    def determine_credit(self, answer):
+        """
+        Return the Credit earned by the answer's key phrases
+        """
+        answer = answer.lower()
+        if self.use_automaton:
+            found = self._scan(answer)
+            is_full = found & _FULL
+            is_half = found & _HALF
+        else:
+            is_full = _any_phrase_in(self.fullcredit_keyphrases, answer)
+            is_half = (
+                not is_full and
+                _any_phrase_in(self.halfcredit_keyphrases, answer)
+            )
+        if is_full:
+            result = Credit.full
+        elif is_half:
+            result = Credit.half
+        else:
+            result = Credit.zero
+        return result
+
+
+class NormalizedMatcher(object):
+    """
+    Score an answer against key phrases, ignoring differences in case,
+    accents, punctuation and spacing
+
+    Phrases and answers are both reduced to their words separated by
+    single spaces, then matched as substrings.
+    """
+
+    def __init__(self, fullcredit_keyphrases, halfcredit_keyphrases):
+        self.matcher = KeyphraseMatcher(
+            [normalize(phrase) for phrase in fullcredit_keyphrases],
+            [normalize(phrase) for phrase in halfcredit_keyphrases],
+        )
+
+    def determine_credit(self, answer):
+        """
+        Return the Credit earned by the answer's key phrases
+        """
+        return self.matcher.determine_credit(normalize(answer))
+
+
+class WholeWordMatcher(object):
+    """
+    Score an answer against key phrases that appear in it as whole words
+
+    Words are normalized as for NormalizedMatcher. Phrases are indexed
+    by their first word, so each word of an answer costs one dict
+    lookup, and only phrases starting with that word are compared.
+    """
+
+    def __init__(self, fullcredit_keyphrases, halfcredit_keyphrases):
+        self._index = {}
+        # Phrases without any words match every answer, as an empty
+        # phrase does when matching as typed.
+        self._always_found = 0
+        for flag, phrases in (
+                (_HALF, halfcredit_keyphrases),
+                (_FULL, fullcredit_keyphrases),
+        ):
+            for phrase in phrases:
+                words = tuple(tokenize(phrase))
+                if words:
+                    self._index.setdefault(words[0], []).append(
+                        (words, flag)
+                    )
+                else:
+                    self._always_found |= flag
+
+    def _scan(self, words):
+        """
+        Return the credit flags found in a list of words
+
+        Stops as soon as a full-credit phrase is found.
+        """
+        found = self._always_found
+        if found & _FULL:
+            return found
+        index = self._index
+        for position, word in enumerate(words):
+            candidates = index.get(word)
+            if candidates is None:
+                continue
+            for phrase, flag in candidates:
+                if found & flag:
+                    continue
+                end = position + len(phrase)
+                if tuple(words[position:end]) == phrase:
+                    found |= flag
+            if found & _FULL:
+                break
+        return found
+
+    def determine_credit(self, answer):
+        """
+        Return the Credit earned by the answer's key phrases
+        """
+        return _credit_for(self._scan(tokenize(answer)))
+
+
+class FuzzyMatcher(WholeWordMatcher):
+    """
+    Score an answer against key phrases, forgiving typos and word endings
+
+    Words are normalized as for NormalizedMatcher and stemmed, and a
+    word in the answer matches a phrase word within a few edits of it
+    (see edit_allowance). Phrases must still appear as whole words.
+
+    Each phrase word is indexed under every variant of it with up to
+    its allowed number of characters deleted. Two words within k edits
+    share a variant with at most k deletions from each, so each answer
+    word is checked with a bounded number of dict lookups, however
+    many phrases there are. Only the few candidates found that way get
+    a full edit-distance check. Results are remembered per answer word,
+    in an LRU cache, so common words are only checked once for all
+    learners.
+
+    Checking a word for typos still costs tens of lookups, so each
+    answer may check at most FUZZY_WORDS_PER_ANSWER words that have not
+    been remembered yet. Further new words must match a phrase word
+    exactly, and are left to be checked for typos by a later answer.
+    """
+
+    def __init__(self, fullcredit_keyphrases, halfcredit_keyphrases):
+        super(FuzzyMatcher, self).__init__(
+            [_stem_phrase(phrase) for phrase in fullcredit_keyphrases],
+            [_stem_phrase(phrase) for phrase in halfcredit_keyphrases],
+        )
+        self._variants = {}
+        # The most edits any phrase word of reach allows, by answer
+        # word length; other lengths cannot match at all.
+        self._allowances = {}
+        self._word_matches = LRUCache(WORD_MATCH_CACHE_SIZE)
+        self._words = self._index_words()
+        for word in self._words:
+            allowance = edit_allowance(word)
+            for length in range(
+                    len(word) - allowance,
+                    len(word) + allowance + 1,
+            ):
+                self._allowances[length] = max(
+                    allowance,
+                    self._allowances.get(length, 0),
+                )
+            for variant in _deletions(word, allowance):
+                self._variants.setdefault(variant, set()).add(word)
+
+    def _index_words(self):
+        """
+        Return the distinct words of every phrase
+        """
+        return set(
+            word
+            for candidates in self._index.values()
+            for phrase, _flag in candidates
+            for word in phrase
+        )
+
+    def _match_word(self, token, tolerant=True):
+        """
+        Return the phrase words that an answer word matches
+
+        Unless tolerant, only a phrase word equal to the stemmed word
+        matches, and the result is not remembered, so a later answer can
+        still check the word for typos.
+        """
+        word = stem(token)
+        allowance = self._allowances.get(len(word))
+        if allowance is None:
+            result = frozenset()
+        elif not tolerant:
+            if word in self._words:
+                return frozenset([word])
+            return frozenset()
+        else:
+            found = set()
+            for variant in _deletions(word, allowance):
+                for candidate in self._variants.get(variant, ()):
+                    if candidate in found:
+                        continue
+                    allowance = edit_allowance(candidate)
+                    if edit_distance(word, candidate, allowance) <= allowance:
+                        found.add(candidate)
+            result = frozenset(found)
+        self._word_matches.set(token, result)
+        return result
+
+    def _scan(self, words):
+        """
+        Return the credit flags found in a list of words
+
+        Stops as soon as a full-credit phrase is found.
+        """
+        found = self._always_found
+        if found & _FULL:
+            return found
+        index = self._index
+        word_matches = {}
+        remembered = self._word_matches
+        budget = FUZZY_WORDS_PER_ANSWER
+        matches = []
+        for word in words:
+            matched = word_matches.get(word)
+            if matched is None:
+                matched = remembered.get(word)
+                if matched is None:
+                    matched = self._match_word(word, budget > 0)
+                    budget -= 1
+                word_matches[word] = matched
+            matches.append(matched)
+        for position, matched in enumerate(matches):
+            for first_word in matched:
+                for phrase, flag in index.get(first_word, ()):
+                    if found & flag:
+                        continue
+                    following = matches[position + 1:position + len(phrase)]
+                    if len(following) == len(phrase) - 1 and all(
+                            word in matched_words
+                            for word, matched_words
+                            in zip(phrase[1:], following)
+                    ):
+                        found |= flag
+            if found & _FULL:
+                break
+        return found
+
+    def determine_credit(self, answer):
+        """
+        Return the Credit earned by the answer's key phrases
+        """
+        return _credit_for(self._scan(tokenize(answer)))
+
+
+_MATCHER_CLASSES = {
+    KeyphraseMatching.exact: KeyphraseMatcher,
+    KeyphraseMatching.normalized: NormalizedMatcher,
+    KeyphraseMatching.whole_words: WholeWordMatcher,
+    KeyphraseMatching.fuzzy: FuzzyMatcher,
+}
+
+
+def tokenize(text):
+    """
+    Split text into lower-cased words, ignoring accents
+
+    Text is first put in Unicode compatibility form, so ligatures and
+    full-width letters compare equal to their plain forms. Hyphens and
+    apostrophes inside a word are dropped, so "photo-synthesis" reads
+    as "photosynthesis"; any other punctuation or space separates words.
+    """
+    text = text_type(text)
+    decomposed = unicodedata.normalize('NFKD', text)
+    if decomposed != text:
+        decomposed = _ACCENTS.sub(u'', decomposed)
+    return _WORDS.findall(_JOINERS.sub(u'', decomposed.lower()))
+
+
+def normalize(text):
+    """
+    Return the words of text separated by single spaces
+    """
+    return u' '.join(tokenize(text))
+
+
+def stem(word):
+    """
+    Strip a common English inflection from a lower-cased word
+
+    This is deliberately light: "reacts", "reacting" and "reacted" all
+    become "react", and "studies" becomes "study", while short words
+    are left alone.
+    """
+    if word.endswith('ss'):
+        return word
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix):
+            result = word[:-len(suffix)] + replacement
+            if len(result) >= _STEM_MIN_LENGTH:
+                return result
+    return word
+
+
+def _stem_phrase(phrase):
+    """
+    Return a phrase's words, stemmed and separated by single spaces
+    """
+    return u' '.join(stem(word) for word in tokenize(phrase))
+
+
+def edit_allowance(word):
+    """
+    Return how many edits a word may differ by and still match
+
+    Short words must match exactly, since a single edit turns them
+    into other words too easily.
+    """
+    if len(word) < 5:
+        result = 0
+    elif len(word) < 9:
+        result = 1
+    else:
+        result = 2
+    return min(result, MAX_EDIT_DISTANCE)
+
+
+def _deletions(word, count):
+    """
+    Return the variants of word with up to count characters deleted
+
+    Characters are only deleted left to right, so each combination of
+    deleted positions is generated once.
+    """
+    result = [word]
+    layer = [(word, 0)]
+    for _ in range(count):
+        layer = [
+            (variant[:index] + variant[index + 1:], index)
+            for variant, start in layer
+            for index in range(start, len(variant))
+        ]
+        result.extend(variant for variant, _start in layer)
+    return result
+
+
+def edit_distance(first, second, limit):
+    """
+    Return the Levenshtein distance between two words, or limit + 1 once
+    it is known to exceed limit
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = list(range(len(second) + 1))
+    for row, first_character in enumerate(first, 1):
+        current = [row]
+        for column, second_character in enumerate(second, 1):
+            current.append(min(
+                previous[column] + 1,
+                current[column - 1] + 1,
+                previous[column - 1] + (first_character != second_character),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _credit_for(found):
+    """
+    Return the Credit for a set of found flags
+    """
+    if found & _FULL:
+        result = Credit.full
+    elif found & _HALF:
+        result = Credit.half
+    else:
+        result = Credit.zero
+    return result
+
+
+def _any_phrase_in(phrases, answer):
+    """
+    Determines if at least one of the (lower-cased) phrases is
+    present in the (lower-cased) answer
+    """
+    return any(
+        phrase in answer
+        for phrase in phrases
+    )
+
+
+def get_matcher(
+        fullcredit_keyphrases,
+        halfcredit_keyphrases,
+        keyphrase_matching=KeyphraseMatching.exact.value,
+):
+    """
+    Return a (cached) matcher for the given phrase lists and matching
+
+    Matchers are shared by every block instance in the process that
+    uses the same key phrases, so phrases are only compiled or indexed
+    again once the settings change. An unknown matching, such as one
+    imported from OLX that Studio never validated, falls back to exact.
+    """
+    key = (
+        tuple(fullcredit_keyphrases),
+        tuple(halfcredit_keyphrases),
+        keyphrase_matching,
+    )
+    matcher = _MATCHERS.get(key)
+    if matcher is None:
+        try:
+            matching = KeyphraseMatching(keyphrase_matching)
+        except ValueError:
+            matching = KeyphraseMatching.exact
+        matcher = _MATCHER_CLASSES[matching](*key[:2])
+        _MATCHERS.set(key, matcher)
+    return matcher
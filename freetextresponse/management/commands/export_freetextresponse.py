@@ -0,0 +1,90 @@
+"""
+Export every stored answer to a Free-text Response block
+"""
+from __future__ import absolute_import
+
+import gzip
+import io
+import sys
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from freetextresponse.export import EXPORT_FORMATS
+from freetextresponse.export import iter_export_lines
+from freetextresponse.export import iter_records
+from freetextresponse.export import write_lines
+from freetextresponse.regrade import BATCH_SIZE
+from freetextresponse.regrade import StudentModuleStates
+
+try:
+    from opaque_keys.edx.keys import UsageKey
+    from xmodule.modulestore.django import modulestore
+except ImportError:  # pragma: no cover
+    modulestore = None
+
+
+class Command(BaseCommand):
+    """
+    Stream learners' answers, scores and attempts to a file
+    """
+
+    help = (
+        'Export the answer, score and attempt count of every learner '
+        'of a Free-text Response block, as CSV or JSON Lines'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usage_key',
+            help='Usage key of the freetextresponse block',
+        )
+        parser.add_argument(
+            '--format',
+            choices=EXPORT_FORMATS,
+            default='csv',
+            help='Output format',
+        )
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='File to write to; standard output by default',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress the output with gzip',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Number of learners to read from the database at a time',
+        )
+
+    def handle(self, *args, **options):
+        if modulestore is None:
+            raise CommandError('This command requires edx-platform')
+        usage_key = UsageKey.from_string(options['usage_key'])
+        if not modulestore().has_item(usage_key):
+            raise CommandError('No block found at {}'.format(usage_key))
+        states = StudentModuleStates(usage_key)
+        rows = states.iter_learner_states(options['batch_size'])
+        lines = iter_export_lines(iter_records(rows), options['format'])
+        if options['output'] == '-':
+            stream = getattr(sys.stdout, 'buffer', sys.stdout)
+        else:
+            stream = io.open(options['output'], 'wb')
+        output = stream
+        if options['gzip']:
+            output = gzip.GzipFile(fileobj=stream, mode='wb')
+        try:
+            count = write_lines(lines, output)
+        finally:
+            if output is not stream:
+                output.close()
+            if options['output'] == '-':
+                stream.flush()
+            else:
+                stream.close()
+        self.stderr.write('Exported {} lines'.format(count))
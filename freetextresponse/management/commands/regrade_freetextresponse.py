@@ -0,0 +1,72 @@
+"""
+Regrade every stored answer to a Free-text Response block
+"""
+from __future__ import absolute_import
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from freetextresponse.regrade import BATCH_SIZE
+from freetextresponse.regrade import regrade_states
+from freetextresponse.regrade import StudentModuleStates
+
+try:
+    from opaque_keys.edx.keys import UsageKey
+    from xmodule.modulestore.django import modulestore
+except ImportError:  # pragma: no cover
+    modulestore = None
+
+
+class Command(BaseCommand):
+    """
+    Rescore stored answers with the block's current key phrases
+    """
+
+    help = (
+        'Rescore every stored answer to a Free-text Response block '
+        'against its current settings, and save the scores that changed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usage_key',
+            help='Usage key of the freetextresponse block',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Number of answers to score per batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the scores that would change without saving them',
+        )
+
+    def handle(self, *args, **options):
+        if modulestore is None:
+            raise CommandError('This command requires edx-platform')
+        usage_key = UsageKey.from_string(options['usage_key'])
+        block = modulestore().get_item(usage_key)
+        states = StudentModuleStates(usage_key)
+        read_total = 0
+        changed_total = 0
+        batches = regrade_states(block, states, options['batch_size'])
+        for read_count, changed in batches:
+            if not options['dry_run']:
+                states.save(block, changed)
+            read_total += read_count
+            changed_total += len(changed)
+            self.stdout.write(
+                'Scored {read} answers, {changed} changed'.format(
+                    read=read_total,
+                    changed=changed_total,
+                )
+            )
+        summary = 'Done: {changed} of {read} scores {action}'.format(
+            changed=changed_total,
+            read=read_total,
+            action='would change' if options['dry_run'] else 'changed',
+        )
+        self.stdout.write(summary)
@@ -6,9 +6,126 @@ split into its own library.
 """
 from __future__ import absolute_import
 
+import re
+import weakref
+
+from django.template import Context
+from django.template import Engine
+from django.template import Template
+from django.template.backends.django import get_installed_libraries
+from django.utils import translation
+from django.utils.html import conditional_escape
+from six import text_type
 from xblock.core import XBlock
 from xblock.fragment import Fragment
 
+from ..cache import LRUCache
+from ..instrumentation import incr
+from ..instrumentation import timed
+from ..instrumentation import timer
+
+
+FRAGMENT_CACHE_SIZE = 256
+TEMPLATE_LIBRARIES = {
+    'i18n': 'xblockutils.templatetags.i18n',
+}
+
+# Compiled templates with their constant {% trans %} tags translated,
+# by (resource module, template path, language)
+_LOCALIZED_TEMPLATES = {}
+# A {% trans %} tag of a plain string literal, with no other options
+_TRANS_TAG = re.compile(r"""\{%\s*trans\s+("[^"\\]*"|'[^'\\]*')\s*%\}""")
+_BRACE_ENTITIES = (('{', '&#123;'), ('}', '&#125;'))
+_TRANSLATION_SEPARATOR = u'\x00'
+# Resolved static asset URLs, by runtime, then (block type, asset path)
+_RESOURCE_URLS = weakref.WeakKeyDictionary()
+# Rendered student views, by get_fragment_cache_key()
+_FRAGMENTS = LRUCache(FRAGMENT_CACHE_SIZE)
+_UNSET = object()
+
+
+def get_localized_template(loader, template_path, i18n_service):
+    """
+    Return the compiled template at template_path, with its constant
+    {% trans %} tags already translated into the active language
+
+    Every block rendering the template in one language shows the same
+    translations, so they are looked up once, with i18n_service, rather
+    than by each tag of each render. Tags with options are left to
+    render as usual. Translations are escaped as {% trans %} would
+    escape them, and their braces too, so they can neither add markup
+    nor be read as template syntax.
+    """
+    key = (loader.module_name, template_path, translation.get_language())
+    template = _LOCALIZED_TEMPLATES.get(key)
+    if template is None:
+        source = loader.load_unicode(template_path)
+        tags = sorted(set(
+            match.group(0)
+            for match in _TRANS_TAG.finditer(source)
+        ))
+        if tags:
+            translations = _compile(
+                u'{% load i18n %}{% autoescape off %}' +
+                _TRANSLATION_SEPARATOR.join(tags) +
+                u'{% endautoescape %}'
+            ).render(Context({
+                '_i18n_service': i18n_service,
+            })).split(_TRANSLATION_SEPARATOR)
+            translated = {
+                tag: _escape_translation(text)
+                for tag, text in zip(tags, translations)
+            }
+            source = _TRANS_TAG.sub(
+                lambda match: translated[match.group(0)],
+                source,
+            )
+        template = _compile(source)
+        _LOCALIZED_TEMPLATES[key] = template
+    return template
+
+
+def _escape_translation(text):
+    """
+    Escape a translation to be pasted into template source
+    """
+    result = text_type(conditional_escape(text))
+    for brace, entity in _BRACE_ENTITIES:
+        result = result.replace(brace, entity)
+    return result
+
+
+def _compile(source):
+    """
+    Compile template source with the tag libraries blocks use
+    """
+    libraries = get_installed_libraries()
+    libraries.update(TEMPLATE_LIBRARIES)
+    engine = Engine(libraries=libraries)
+    template = Template(source, engine=engine)
+    return template
+
+
+class LazyValue(object):
+    """
+    A context value computed the first time a template reads it
+
+    Django templates call the callables they resolve, so the function
+    only runs if a branch of the template that uses the value is
+    rendered, and runs at most once however often it is used.
+    """
+
+    __slots__ = ('function', 'value')
+
+    def __init__(self, function):
+        self.function = function
+        self.value = _UNSET
+
+    def __call__(self):
+        if self.value is _UNSET:
+            self.value = self.function()
+        return self.value
+
 
 class XBlockFragmentBuilderMixin(object):
     """
@@ -33,16 +150,40 @@ class XBlockFragmentBuilderMixin(object):
         context = dict(context)
         return context
 
+    def get_fragment_cache_key(self, context=None):
+        # pylint: disable=unused-argument
+        """
+        Returns the key to cache the rendered student view under
+
+        Returning an empty key, as by default, renders the view every
+        time.
+        """
+        return ()
+
     @XBlock.supports('multi_device')
+    @timed('student_view')
     def student_view(self, context=None):
         """
         Build the fragment for the default student view
         """
         template = self.template
-        context = self.provide_context(context)
         static_css = self.static_css or []
         static_js = self.static_js or []
         js_init = self.static_js_init
+        cache_key = self.get_fragment_cache_key(context)
+        content = None
+        if cache_key:
+            content = _FRAGMENTS.get(cache_key)
+        if content is not None:
+            incr('fragment_cache_hits')
+            fragment = self.build_fragment(
+                content=content,
+                css=static_css,
+                js=static_js,
+                js_init=js_init,
+            )
+            return fragment
+        context = self.provide_context(context)
         fragment = self.build_fragment(
             template=template,
             context=context,
@@ -50,6 +191,8 @@ class XBlockFragmentBuilderMixin(object):
             js=static_js,
             js_init=js_init,
         )
+        if cache_key:
+            _FRAGMENTS.set(cache_key, fragment.content)
         return fragment
 
     def build_fragment(
@@ -59,33 +202,67 @@ class XBlockFragmentBuilderMixin(object):
             css=None,
             js=None,
             js_init=None,
+            content='',
     ):
         """
         Creates a fragment for display.
+
+        The template is rendered with the context, unless content was
+        already rendered.
         """
         context = context or {}
         css = css or []
         js = js or []
-        rendered_template = ''
+        rendered_template = content
         if template:  # pragma: no cover
             template = 'templates/' + template
-            rendered_template = self.loader.render_django_template(
-                template,
-                context=context,
-                i18n_service=self.runtime.service(self, 'i18n'),
-            )
+            rendered_template = self.render_template(template, context)
         fragment = Fragment(rendered_template)
         for item in css:
             if item.startswith('/'):
                 url = item
             else:
                 item = 'public/' + item
-                url = self.runtime.local_resource_url(self, item)
+                url = self.get_resource_url(item)
             fragment.add_css_url(url)
         for item in js:
             item = 'public/' + item
-            url = self.runtime.local_resource_url(self, item)
+            url = self.get_resource_url(item)
             fragment.add_javascript_url(url)
         if js_init:  # pragma: no cover
             fragment.initialize_js(js_init)
         return fragment
+
+    def render_template(self, template_path, context):
+        """
+        Render a template from this block's package
+        """
+        context = dict(context)
+        i18n_service = self.runtime.service(self, 'i18n')
+        context['_i18n_service'] = i18n_service
+        template = get_localized_template(
+            self.loader,
+            template_path,
+            i18n_service,
+        )
+        with timer('render_template'):
+            rendered = template.render(Context(context))
+        return rendered
+
+    def get_resource_url(self, item):
+        """
+        Returns the runtime URL of a static asset in this block's package
+
+        URLs are resolved once per runtime and reused by every block
+        of the same type rendered by it.
+        """
+        urls = _RESOURCE_URLS.get(self.runtime)
+        if urls is None:
+            urls = {}
+            _RESOURCE_URLS[self.runtime] = urls
+        key = (self.scope_ids.block_type, item)
+        url = urls.get(key)
+        if url is None:
+            url = self.runtime.local_resource_url(self, item)
+            urls[key] = url
+        return url
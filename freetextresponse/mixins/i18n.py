@@ -1,8 +1,38 @@
 """
 Mixin i18n logic
 """
+import threading
+import weakref
+
+from django.utils import translation
 from xblock.core import XBlock
 
+from ..cache import LRUCache
+
+
+TRANSLATION_CACHE_SIZE = 1024
+
+# Translated strings, by i18n service, then by (function, locale,
+# arguments); a cache goes away with its service
+_TRANSLATIONS = weakref.WeakKeyDictionary()
+_TRANSLATIONS_LOCK = threading.Lock()
+
+
+def _get_translation_cache(service):
+    """
+    Return the cache of strings translated by an i18n service, or None
+    if the service cannot be tracked
+    """
+    with _TRANSLATIONS_LOCK:
+        try:
+            cache = _TRANSLATIONS.get(service)
+            if cache is None:
+                cache = LRUCache(TRANSLATION_CACHE_SIZE)
+                _TRANSLATIONS[service] = cache
+        except TypeError:
+            return None
+    return cache
+
 
 @XBlock.needs('i18n')
 class I18nXBlockMixin(XBlock):
@@ -13,20 +43,46 @@ class I18nXBlockMixin(XBlock):
     def _i18n_service(self):
         """
         Provide the XBlock runtime's i18n service
+
+        The service is looked up once per block instance.
         """
-        service = self.runtime.service(self, 'i18n')
+        service = getattr(self, '_i18n_service_instance', None)
+        if service is None:
+            service = self.runtime.service(self, 'i18n')
+            self._i18n_service_instance = service
         return service
 
+    def _translate(self, function, *args, **kwargs):
+        """
+        Call an i18n service function, caching its result per service
+        and locale
+        """
+        service = self._i18n_service()
+        cache = _get_translation_cache(service)
+        if cache is None:
+            return getattr(service, function)(*args, **kwargs)
+        key = (
+            function,
+            translation.get_language(),
+            args,
+            tuple(sorted(kwargs.items())),
+        )
+        text = cache.get(key)
+        if text is None:
+            text = getattr(service, function)(*args, **kwargs)
+            cache.set(key, text)
+        return text
+
     def ugettext(self, text):
         """
         Call ugettext from the XBlock i18n service
         """
-        text = self._i18n_service().ugettext(text)
+        text = self._translate('ugettext', text)
         return text
 
     def ungettext(self, *args, **kwargs):
         """
         Call ungettext from the XBlock i18n service
         """
-        text = self._i18n_service().ungettext(*args, **kwargs)
+        text = self._translate('ungettext', *args, **kwargs)
         return text
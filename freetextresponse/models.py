@@ -3,8 +3,13 @@ Handle data access logic for the XBlock
 """
 from __future__ import absolute_import
 
+import functools
+import hashlib
+import json
+
 from enum import Enum
-from django.db import IntegrityError
+from six import text_type
+from django.utils import translation
 from django.utils.translation import ugettext_lazy as _
 from xblock.fields import Boolean
 from xblock.fields import Float
@@ -13,8 +18,34 @@ from xblock.fields import List
 from xblock.fields import Scope
 from xblock.fields import String
 
+from .cache import LRUCache
+from .fields import CompressedString
+from .fields import get_compression_min_bytes
+from .instrumentation import timer
+from .pool import ResponsePool
+from .publishing import get_grade_publisher
+from .summary import update_summary_field
+
 
 MAX_RESPONSES = 3
+RESPONSE_POOL_SIZE = 10
+SETTINGS_CACHE_SIZE = 256
+
+# SettingsValues, by block definition
+_SETTINGS_VALUES = LRUCache(SETTINGS_CACHE_SIZE)
+
+
+class KeyphraseMatching(Enum):
+    # pylint: disable=too-few-public-methods
+    """
+    An enumeration of the ways key phrases can be matched against an
+    answer: Exact (case-insensitive) substrings, Normalized substrings,
+    Whole Words, and Fuzzy whole words that tolerate typos
+    """
+    exact = 'exact'
+    normalized = 'normalized'
+    whole_words = 'whole_words'
+    fuzzy = 'fuzzy'
 
 
 class FreeTextResponseModelMixin(object):
@@ -32,11 +63,25 @@ class FreeTextResponseModelMixin(object):
         'max_word_count',
         'fullcredit_keyphrases',
         'halfcredit_keyphrases',
+        'keyphrase_matching',
         'submitted_message',
         'display_other_student_responses',
+        'max_other_responses',
+        'response_pool_size',
         'saved_message',
+        'autosave',
     ]
 
+    autosave = Boolean(
+        display_name=_('Autosave Drafts'),
+        help=_(
+            'This is a flag that indicates if drafts should be saved '
+            'automatically while students type their response'
+        ),
+        default=False,
+        scope=Scope.settings,
+    )
+
     display_correctness = Boolean(
         display_name=_('Display Correctness?'),
         help=_(
@@ -89,6 +134,35 @@ class FreeTextResponseModelMixin(object):
         default=[],
         scope=Scope.settings,
     )
+    keyphrase_matching = String(
+        display_name=_('Key Phrase Matching'),
+        help=_(
+            'This is how key phrases are found in the student\'s '
+            'answer: as typed, ignoring differences in accents, '
+            'punctuation and spacing, only as whole words, or as whole '
+            'words allowing for typos and different word endings'
+        ),
+        default=KeyphraseMatching.exact.value,
+        values=[
+            {
+                'display_name': _('As Typed'),
+                'value': KeyphraseMatching.exact.value,
+            },
+            {
+                'display_name': _('Normalized'),
+                'value': KeyphraseMatching.normalized.value,
+            },
+            {
+                'display_name': _('Whole Words'),
+                'value': KeyphraseMatching.whole_words.value,
+            },
+            {
+                'display_name': _('Tolerant'),
+                'value': KeyphraseMatching.fuzzy.value,
+            },
+        ],
+        scope=Scope.settings,
+    )
     max_attempts = Integer(
         display_name=_('Maximum Number of Attempts'),
         help=_(
@@ -99,6 +173,16 @@ class FreeTextResponseModelMixin(object):
         values={'min': 1},
         scope=Scope.settings,
     )
+    max_other_responses = Integer(
+        display_name=_('Number of Other Student Responses'),
+        help=_(
+            'This is the number of other student responses shown '
+            'to each student after they submit their response'
+        ),
+        default=MAX_RESPONSES,
+        values={'min': 0},
+        scope=Scope.settings,
+    )
     max_word_count = Integer(
         display_name=_('Maximum Word Count'),
         help=_(
@@ -148,6 +232,16 @@ class FreeTextResponseModelMixin(object):
         values={'min': 1},
         scope=Scope.settings,
     )
+    response_pool_size = Integer(
+        display_name=_('Response Pool Size'),
+        help=_(
+            'This is the number of full-credit responses kept as a '
+            'random sample from which other student responses are shown'
+        ),
+        default=RESPONSE_POOL_SIZE,
+        values={'min': 1},
+        scope=Scope.settings,
+    )
     saved_message = String(
         display_name=_('Draft Received Message'),
         help=_(
@@ -168,38 +262,168 @@ class FreeTextResponseModelMixin(object):
         default=0.0,
         scope=Scope.user_state,
     )
-    student_answer = String(
+    student_answer = CompressedString(
         default='',
         scope=Scope.user_state,
     )
+    student_answer_version = Integer(
+        default=0,
+        scope=Scope.user_state,
+    )
+    submitted_answer_version = Integer(
+        default=None,
+        scope=Scope.user_state,
+        help=_('The student_answer_version last submitted'),
+    )
     has_score = True
     show_in_read_only_mode = True
 
+    def set_student_answer(self, answer):
+        """
+        Store the learner's answer, counting a new version if it changed
+
+        Saving an unchanged answer writes nothing.
+        """
+        if answer != self.student_answer:
+            self.student_answer = answer
+            self.student_answer_version += 1
+
     def store_student_response(self):
         """
-        Submit a student answer to the answer pool by appending the given
-        answer to the end of the list.
+        Submit a student answer to the answer pool, replacing any answer
+        the student had already submitted.
         """
         # if the answer is wrong, do not display it
         if self.score != Credit.full.value:
             return
 
         student_id = self.get_student_id()
-        # remove any previous answers the student submitted
-        for index, response in enumerate(self.displayable_answers):
-            if response['student_id'] == student_id:
-                del self.displayable_answers[index]
-                break
-
-        self.displayable_answers.append({
-            'student_id': student_id,
-            'answer': self.student_answer,
-        })
-
-        # Want to store extra response so student can still see
-        # MAX_RESPONSES answers if their answer is in the pool.
-        response_index = -(MAX_RESPONSES+1)
-        self.displayable_answers = self.displayable_answers[response_index:]
+        min_bytes = get_compression_min_bytes()
+
+        def add_response(entries):
+            """
+            Returns the stored pool with this answer added, or None if
+            adding it changes nothing
+            """
+            pool = self._build_response_pool(entries)
+            pool.add(student_id, self.student_answer)
+            result = pool.to_list(min_bytes)
+            if result == entries:
+                return None
+            return result
+
+        with timer('pool_update'):
+            # Other students may have written to the pool since this
+            # block loaded it, so update what is stored now instead of
+            # writing back this block's copy.
+            entries = update_summary_field(
+                self,
+                'displayable_answers',
+                add_response,
+            )
+            if entries is not None:
+                self._response_pool = (
+                    entries,
+                    self._build_response_pool(entries),
+                )
+
+    def get_response_pool(self):
+        """
+        Returns the ResponsePool backing displayable_answers
+
+        The pool is only rebuilt when the stored list or its size
+        changes.
+        """
+        displayable_answers = self.displayable_answers
+        cached = getattr(self, '_response_pool', None)
+        if cached is not None and cached[0] is displayable_answers \
+                and cached[1].capacity == self.response_pool_size:
+            return cached[1]
+        pool = self._build_response_pool(displayable_answers)
+        self._response_pool = (displayable_answers, pool)
+        return pool
+
+    def _build_response_pool(self, entries):
+        """
+        Returns a ResponsePool for this block holding the given entries
+        """
+        pool = ResponsePool(
+            self.response_pool_size,
+            entries,
+            salt=text_type(self.scope_ids.usage_id),
+        )
+        return pool
+
+    def __setattr__(self, name, value):
+        super(FreeTextResponseModelMixin, self).__setattr__(name, value)
+        field = self.fields.get(name)
+        if field is not None and field.scope == Scope.settings:
+            # Assigning a setting invalidates this instance's snapshot
+            self._settings_values = None
+
+    def get_settings_version(self):
+        """
+        Returns a short digest of the block's settings
+
+        It differs whenever an author saves different settings, so it
+        can key caches of values derived from them.
+        """
+        return self.get_settings_values().digest
+
+    def get_settings_values(self):
+        """
+        Returns the SettingsValues shared by every copy of this block
+        definition in the process
+
+        The settings are snapshotted once per block instance, and again
+        after a setting is assigned; the shared values are replaced once
+        the snapshot differs from the one they were derived from.
+        """
+        values = getattr(self, '_settings_values', None)
+        if values is None:
+            version = tuple(
+                (name, _freeze(field.read_from(self)))
+                for name, field in sorted(self.fields.items())
+                if field.scope == Scope.settings
+            )
+            key = text_type(self.scope_ids.def_id)
+            values = _SETTINGS_VALUES.get(key)
+            if values is None or values.version != version:
+                values = SettingsValues(version)
+                _SETTINGS_VALUES.set(key, values)
+            self._settings_values = values
+        return values
+
+    def reset_settings_values(self):
+        """
+        Forget the settings snapshot and the values shared with other
+        learners, after the settings were saved
+        """
+        self._settings_values = None
+        _SETTINGS_VALUES.discard(text_type(self.scope_ids.def_id))
+
+    def get_state_version(self):
+        """
+        Returns a version identifying the learner's state and the
+        response pool
+
+        It differs whenever the answer, attempts, score, pool, settings
+        or language change. It is made of the answer version, which
+        saves change, then a short digest of the rest, which they leave
+        alone; the answer is represented by its version, so a long
+        answer stored compressed is not inflated just to build it.
+        """
+        result = '{}-{}'.format(
+            self.student_answer_version,
+            get_digest((
+                self.count_attempts,
+                self.score,
+                self.displayable_answers,
+                self.get_settings_version(),
+                translation.get_language(),
+            )),
+        )
+        return result
 
     def max_score(self):
         """
@@ -218,17 +442,80 @@ class FreeTextResponseModelMixin(object):
         """
         credit = self._determine_credit()
         self.score = credit.value
-        try:
-            self.runtime.publish(
-                self,
-                'grade',
-                {
-                    'value': self.score,
-                    'max_value': Credit.full.value
-                }
-            )
-        except IntegrityError:
-            pass
+        get_grade_publisher().publish(
+            self,
+            {
+                'value': self.score,
+                'max_value': Credit.full.value
+            }
+        )
+
+
+class SettingsValues(object):
+    # pylint: disable=too-few-public-methods
+    """
+    Values derived only from a block's settings, for one settings version
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.digest = get_digest(version)
+        self.values = {}
+
+
+def derived_from_settings(by_language=False):
+    """
+    Decorate a block method whose result depends only on the block's
+    settings, and on the active language if by_language is set
+
+    The result is computed once per settings version (and language),
+    and shared by every learner of the block.
+    """
+    def decorator(method):
+        """
+        Share the method's result through the block's SettingsValues
+        """
+        @functools.wraps(method)
+        def wrapper(self):
+            """
+            Return the shared result, computing it on first use
+            """
+            values = self.get_settings_values().values
+            key = method.__name__
+            if by_language:
+                key = (key, translation.get_language())
+            result = values.get(key)
+            if result is None:
+                result = method(self)
+                values[key] = result
+            return result
+        return wrapper
+    return decorator
+
+
+def get_digest(value):
+    """
+    Returns a short digest of a value made of JSON types
+    """
+    encoded = json.dumps(value, sort_keys=True, default=repr)
+    digest = hashlib.md5(encoded.encode('utf-8')).hexdigest()
+    return digest[:12]
+
+
+def _freeze(value):
+    """
+    Returns a hashable copy of a field value
+    """
+    if isinstance(value, dict):
+        result = tuple(sorted(
+            (key, _freeze(item))
+            for key, item in value.items()
+        ))
+    elif isinstance(value, (list, tuple)):
+        result = tuple(_freeze(item) for item in value)
+    else:
+        result = value
+    return result
 
 
 class Credit(Enum):
@@ -0,0 +1,192 @@
+"""
+Score very large answers on a process pool
+
+Parallel scoring is off unless the FREETEXTRESPONSE_SCORING_WORKERS
+Django setting asks for more than one worker. Even then, only answers
+of at least FREETEXTRESPONSE_PARALLEL_SCORING_MIN_CHARACTERS leave the
+request thread; everything else is matched inline. An answer whose
+segments are not all scored within FREETEXTRESPONSE_PARALLEL_SCORING_TIMEOUT
+seconds is scored inline instead.
+
+The pool is only ever started when Django loads the app, which needs
+freetextresponse in INSTALLED_APPS, so that it is forked before the web
+server starts any request thread. Processes without a pool of their
+own, such as web server workers forked from a master that loaded the
+app, score everything inline rather than fork from a request thread.
+"""
+from __future__ import absolute_import
+
+import multiprocessing
+import os
+import time
+
+from django.conf import settings
+
+from .instrumentation import incr
+from .keyphrases import get_matcher
+from .models import Credit
+from .models import KeyphraseMatching
+
+
+# Below this many characters, handing an answer to other processes
+# costs more than scanning it inline.
+PARALLEL_MIN_CHARACTERS = 200000
+# Seconds to wait for a worker before scoring the answer inline
+PARALLEL_TIMEOUT = 5
+
+
+_POOLS = {}
+
+
+def get_worker_pool():
+    """
+    Return this process's scoring pool, or None if it did not start one
+
+    Pools are not shared across a fork, so each process has its own.
+    """
+    result = _POOLS.get(os.getpid())
+    return result
+
+
+def get_worker_count():
+    """
+    Return the configured number of scoring workers
+    """
+    result = getattr(settings, 'FREETEXTRESPONSE_SCORING_WORKERS', 0)
+    return result
+
+
+def start_worker_pool():
+    """
+    Start this process's scoring pool, if parallel scoring is on
+
+    This is only called while Django loads the app, before there are
+    request threads to fork along with the pool's processes.
+    """
+    workers = get_worker_count()
+    if workers > 1 and get_worker_pool() is None:
+        _POOLS[os.getpid()] = multiprocessing.Pool(workers)
+
+
+def split_answer(answer, count, overlap):
+    """
+    Split an answer into count segments that overlap by overlap characters
+
+    Every phrase of up to overlap + 1 characters that occurs in the
+    answer lies wholly inside at least one segment.
+    """
+    size = -(-len(answer) // count)
+    result = [
+        answer[start:start + size + overlap]
+        for start in range(0, len(answer), size)
+    ]
+    return result
+
+
+def _score_segment(task):
+    """
+    Score one segment of an answer, in a worker
+    """
+    fullcredit_keyphrases, halfcredit_keyphrases, segment = task
+    matcher = get_matcher(fullcredit_keyphrases, halfcredit_keyphrases)
+    return matcher.determine_credit(segment)
+
+
+def determine_credit_in_parallel(
+        fullcredit_keyphrases,
+        halfcredit_keyphrases,
+        answer,
+        pool,
+        segment_count,
+        timeout=PARALLEL_TIMEOUT,
+):
+    """
+    Return the Credit earned by the answer, scoring segments of it on pool
+
+    Results are merged as they arrive, so the first full-credit match
+    decides the answer; segments still in flight are left to finish and
+    their results are dropped. If the segments are not all scored
+    within timeout seconds in all, say because a worker died, the
+    answer is scored inline.
+    """
+    fullcredit_keyphrases = tuple(fullcredit_keyphrases)
+    halfcredit_keyphrases = tuple(halfcredit_keyphrases)
+    longest = max(
+        len(phrase.lower())
+        for phrase in fullcredit_keyphrases + halfcredit_keyphrases
+    )
+    tasks = [
+        (fullcredit_keyphrases, halfcredit_keyphrases, segment)
+        for segment in split_answer(
+            answer.lower(),
+            segment_count,
+            longest - 1,
+        )
+    ]
+    incr('parallel_scoring')
+    result = Credit.zero
+    deadline = time.time() + timeout
+    results = pool.imap_unordered(_score_segment, tasks)
+    for _task in tasks:
+        try:
+            credit = results.next(max(deadline - time.time(), 0))
+        except multiprocessing.TimeoutError:
+            incr('parallel_scoring_timeouts')
+            matcher = get_matcher(fullcredit_keyphrases, halfcredit_keyphrases)
+            return matcher.determine_credit(answer)
+        if credit == Credit.full:
+            result = credit
+            break
+        if credit == Credit.half:
+            result = credit
+    return result
+
+
+def determine_credit(
+        fullcredit_keyphrases,
+        halfcredit_keyphrases,
+        answer,
+        keyphrase_matching=KeyphraseMatching.exact.value,
+):
+    """
+    Return the Credit earned by the answer's key phrases
+
+    Large enough answers go to the scoring pool when this process
+    started one.
+    Only phrases matched as typed are split across segments; the other
+    matching modes are always scored inline.
+    """
+    if keyphrase_matching == KeyphraseMatching.exact.value:
+        workers = get_worker_count()
+    else:
+        workers = 0
+    if workers > 1:
+        min_characters = getattr(
+            settings,
+            'FREETEXTRESPONSE_PARALLEL_SCORING_MIN_CHARACTERS',
+            PARALLEL_MIN_CHARACTERS,
+        )
+        pool = None
+        if len(answer) >= min_characters:
+            pool = get_worker_pool()
+            if pool is None:
+                incr('parallel_scoring_unavailable')
+        if pool is not None:
+            return determine_credit_in_parallel(
+                fullcredit_keyphrases,
+                halfcredit_keyphrases,
+                answer,
+                pool,
+                workers,
+                getattr(
+                    settings,
+                    'FREETEXTRESPONSE_PARALLEL_SCORING_TIMEOUT',
+                    PARALLEL_TIMEOUT,
+                ),
+            )
+    matcher = get_matcher(
+        fullcredit_keyphrases,
+        halfcredit_keyphrases,
+        keyphrase_matching,
+    )
+    return matcher.determine_credit(answer)
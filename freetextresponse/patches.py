@@ -0,0 +1,50 @@
+"""
+Apply draft edits sent as patches against a saved answer
+"""
+from __future__ import absolute_import
+
+import six
+
+
+class PatchError(ValueError):
+    """
+    Raised when a patch does not fit the answer it is applied to
+    """
+
+
+def _is_offset(value):
+    """
+    Returns whether value can be used as a character offset
+    """
+    result = (
+        isinstance(value, six.integer_types) and
+        not isinstance(value, bool) and
+        value >= 0
+    )
+    return result
+
+
+def apply_patch(text, patch):
+    """
+    Return text with patch applied
+
+    A patch is a dict replacing the characters of text from start up
+    to end with its text, and giving the length of the result. Offsets
+    count code points; a length that does not match means the client
+    counted differently, and the patch is rejected rather than applied
+    in the wrong place.
+    """
+    start = patch.get('start')
+    end = patch.get('end')
+    replacement = patch.get('text')
+    length = patch.get('length')
+    if not (_is_offset(start) and _is_offset(end) and _is_offset(length)):
+        raise PatchError('Patch offsets must be non-negative integers')
+    if not isinstance(replacement, six.string_types):
+        raise PatchError('Patch text must be a string')
+    if not start <= end <= len(text):
+        raise PatchError('Patch does not fit the saved answer')
+    result = u''.join((text[:start], replacement, text[end:]))
+    if len(result) != length:
+        raise PatchError('Patched answer has an unexpected length')
+    return result
@@ -0,0 +1,212 @@
+"""
+Keep a bounded pool of student responses to show to other students
+"""
+from __future__ import absolute_import
+
+import hashlib
+import random
+
+from six.moves import intern
+
+from .fields import dump_text
+from .fields import get_text
+from .fields import load_text
+
+
+class Response(object):
+    """
+    One student's response, as held by a ResponsePool
+
+    Records use __slots__ and interned student ids, so a pool kept in
+    memory costs far less per entry than the dicts it is stored as.
+    Answers stored compressed stay compressed, as CompressedText, until
+    they are shown.
+    """
+
+    __slots__ = ('student_id', 'answer')
+
+    def __init__(self, student_id, answer):
+        self.student_id = intern_student_id(student_id)
+        self.answer = answer
+
+    def __eq__(self, other):
+        if not isinstance(other, Response):
+            return NotImplemented
+        return (
+            self.student_id == other.student_id and
+            self.answer == other.answer
+        )
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash((self.student_id, self.answer))
+
+    def __repr__(self):
+        return 'Response({!r}, {!r})'.format(self.student_id, self.answer)
+
+    @classmethod
+    def from_dict(cls, entry):
+        """
+        Build a record from its stored form
+        """
+        return cls(entry['student_id'], load_text(entry['answer']))
+
+    def to_dict(self, min_bytes=None):
+        """
+        Return the stored form of the record, compressing answers of at
+        least min_bytes
+        """
+        return {
+            'student_id': self.student_id,
+            'answer': dump_text(self.answer, min_bytes),
+        }
+
+    def to_display_dict(self):
+        """
+        Return the record as shown to other students, with its answer
+        inflated
+        """
+        return {
+            'student_id': self.student_id,
+            'answer': get_text(self.answer),
+        }
+
+
+def intern_student_id(student_id):
+    """
+    Return the interned copy of a student id, where Python allows it
+    """
+    try:
+        return intern(student_id)
+    except TypeError:  # Python 2 cannot intern unicode
+        return student_id
+
+
+class ResponsePool(object):
+    """
+    A fixed-capacity reservoir of responses, indexed by student id
+
+    Each student holds at most one slot, and adding a response for a
+    student already in the pool replaces their answer in place.
+
+    The pool is a uniform sample of every student ever added: each
+    student gets a pseudo-random priority derived from their id (and
+    a per-block salt), and the pool keeps the students with the
+    lowest priorities. A new student therefore only displaces the
+    current highest-priority slot when their own priority is lower.
+    Priorities are never stored; they are recomputed from the ids.
+    """
+
+    def __init__(self, capacity, entries=(), salt=''):
+        self.capacity = capacity
+        self.salt = salt
+        self._slots = []
+        self._priorities = []
+        self._index = {}
+        self._max_slot = None
+        for entry in entries:
+            self.add(entry['student_id'], load_text(entry['answer']))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, student_id):
+        return student_id in self._index
+
+    def priority(self, student_id):
+        """
+        Return the sampling priority of a student
+        """
+        digest = hashlib.md5(
+            (self.salt + student_id).encode('utf-8')
+        ).hexdigest()
+        return int(digest[:15], 16)
+
+    def add(self, student_id, answer):
+        """
+        Add (or replace) the response of a student
+
+        Returns whether the response is now in the pool.
+        """
+        entry = Response(student_id, answer)
+        student_id = entry.student_id
+        slot = self._index.get(student_id)
+        if slot is not None:
+            self._slots[slot] = entry
+            return True
+        if self.capacity <= 0:
+            return False
+        priority = self.priority(student_id)
+        if len(self._slots) < self.capacity:
+            self._index[student_id] = len(self._slots)
+            self._slots.append(entry)
+            self._priorities.append(priority)
+            self._max_slot = None
+            return True
+        slot = self._get_max_slot()
+        if priority >= self._priorities[slot]:
+            return False
+        del self._index[self._slots[slot].student_id]
+        self._index[student_id] = slot
+        self._slots[slot] = entry
+        self._priorities[slot] = priority
+        self._max_slot = None
+        return True
+
+    def merge(self, entries):
+        """
+        Fold in the entries of another copy of the pool
+
+        Students already in this pool keep their current answer.
+        Because membership only depends on the students' priorities,
+        merging copies in any order, any number of times, converges
+        on the same pool.
+        """
+        for entry in entries:
+            if entry['student_id'] not in self._index:
+                self.add(entry['student_id'], load_text(entry['answer']))
+
+    def _get_max_slot(self):
+        """
+        Return the slot holding the highest priority
+        """
+        if self._max_slot is None:
+            self._max_slot = max(
+                range(len(self._priorities)),
+                key=self._priorities.__getitem__,
+            )
+        return self._max_slot
+
+    def sample(self, count, seed, exclude=None):
+        """
+        Return up to count responses, leaving out the responses of
+        the excluded student
+
+        The same seed draws the same responses for as long as the pool
+        is unchanged, and a draw costs O(count), however many students
+        have ever been added.
+        """
+        result = []
+        size = min(count + 1, len(self._slots))
+        if count <= 0 or size <= 0:
+            return result
+        rng = random.Random(self.salt + seed)
+        for slot in rng.sample(range(len(self._slots)), size):
+            entry = self._slots[slot]
+            if entry.student_id != exclude:
+                result.append(entry.to_display_dict())
+                if len(result) == count:
+                    break
+        return result
+
+    def to_list(self, min_bytes=None):
+        """
+        Serialize the pool, as a list of dicts, compressing answers of at
+        least min_bytes
+        """
+        return [entry.to_dict(min_bytes) for entry in self._slots]
@@ -11,7 +11,7 @@ function FreeTextResponseView(runtime, element) {
 
     var $ = window.jQuery;
     var $element = $(element);
-    var $xblocksContainer = $('#seq_content');
+    var $problem = $element.find('.freetextresponse').addBack('.freetextresponse');
     var buttonHide = $element.find('.hide-button');
     var buttonHideTextHide = $('.hide', buttonHide);
     var buttonHideTextShow = $('.show', buttonHide);
@@ -23,19 +23,25 @@ function FreeTextResponseView(runtime, element) {
     var userAlertMessage = $element.find('.user_alert');
     var textareaStudentAnswer = $element.find('.student_answer');
     var textareaParent = textareaStudentAnswer.parent();
+    var indicatorStatus = textareaParent.find('.status');
     var responseList = $element.find('.response-list');
-    var url = runtime.handlerUrl(element, 'submit');
-    var urlSave = runtime.handlerUrl(element, 'save_reponse');
-    var xblockId = $element.attr('data-usage-id');
-    var cachedAnswerId = xblockId + '_cached_answer';
-    var problemProgressId = xblockId + '_problem_progress';
-    var usedAttemptsFeedbackId = xblockId + '_used_attempts_feedback';
-
-    if (typeof $xblocksContainer.data(cachedAnswerId) !== 'undefined') {
-        textareaStudentAnswer.text($xblocksContainer.data(cachedAnswerId));
-        problemProgress.text($xblocksContainer.data(problemProgressId));
-        usedAttemptsFeedback.text($xblocksContainer.data(usedAttemptsFeedbackId));
-    }
+    var urlState = runtime.handlerUrl(element, 'student_state');
+    var AUTOSAVE_DELAY = 2000;
+    var SURROGATE_PAIRS = /[\uD800-\uDBFF][\uDC00-\uDFFF]/g;
+    // Drafts are only saved automatically if the author asked for it,
+    // and never once the Save button is gone, as it is past the due date
+    var autosaveEnabled = $problem.attr('data-autosave') === 'true' && buttonSave.length > 0;
+    var autosaveTimer = null;
+    var autosaving = false;
+    // The state version, answer and answer version the server last
+    // acknowledged; drafts are sent as patches against that answer.
+    var stateVersion = $problem.attr('data-state-version');
+    var savedAnswer = textareaStudentAnswer.val();
+    var savedVersion = parseInt(textareaStudentAnswer.attr('data-version'), 10) || 0;
+    // Every view of this block records the last state version it got,
+    // so a view rendered earlier can tell it is out of date
+    var usageId = $element.attr('data-usage-id') || $element.attr('data-usage');
+    var storageKey = usageId ? 'freetextresponse-state-version:' + usageId : null;
 
     // POLYFILL notify if it does not exist. Like in the xblock workbench.
     runtime.notify = runtime.notify || function () {
@@ -43,6 +49,34 @@ function FreeTextResponseView(runtime, element) {
         console.log('POLYFILL runtime.notify', arguments);
     };
 
+    /**
+     * Read the state version last recorded by any view of this block
+     * @returns {?string} the version, or null if none was recorded
+     */
+    function getRecordedVersion() {
+        try {
+            return window.localStorage.getItem(storageKey);
+        } catch (error) {
+            return null;
+        }
+    }
+
+    /**
+     * Record the state version this view now shows
+     * @returns {undefined} nothing
+     */
+    function recordVersion() {
+        if (!storageKey) {
+            return;
+        }
+        try {
+            window.localStorage.setItem(storageKey, stateVersion);
+        } catch (error) {
+            // Storage may be full or disabled; views then always fetch
+            storageKey = null;
+        }
+    }
+
     /**
      * Update CSS classes
      * @param {string} newClass - a CSS class name to be used
@@ -72,19 +106,185 @@ function FreeTextResponseView(runtime, element) {
 
     /**
      * Display responses, if applicable
-     * @param {Object} response - a jQuery HTTP response
+     * @param {Array} responses - the responses to show, or null to hide them
      * @returns {undefined} nothing
      */
-    function displayResponsesIfAnswered(response) {
-        if (!response.display_other_responses) {
+    function displayResponsesIfAnswered(responses) {
+        if (!responses) {
             $element.find('.responses-box').addClass('hidden');
             return;
         }
-        var responseHTML = getStudentResponsesHtml(response.other_responses);
+        var responseHTML = getStudentResponsesHtml(responses);
         responseList.html(responseHTML);
         $element.find('.responses-box').removeClass('hidden');
     }
 
+    /**
+     * Show the state fields that changed since the last response
+     * @param {Object} response - a student_state handler response
+     * @returns {undefined} nothing
+     */
+    function applyState(response) {
+        var state = response.state;
+        stateVersion = response.state_version;
+        recordVersion();
+        if ('problem_progress' in state) {
+            problemProgress.text(state.problem_progress);
+        }
+        if ('used_attempts_feedback' in state) {
+            usedAttemptsFeedback.text(state.used_attempts_feedback);
+        }
+        if ('nodisplay_class' in state) {
+            buttonSubmit.removeClass('nodisplay').addClass(state.nodisplay_class);
+            buttonSave.removeClass('nodisplay').addClass(state.nodisplay_class);
+        }
+        if ('indicator_class' in state) {
+            setClassForTextAreaParent(state.indicator_class);
+        }
+        if ('visibility_class' in state) {
+            indicatorStatus.removeClass('hidden').addClass(state.visibility_class);
+        }
+        if ('other_responses' in state) {
+            displayResponsesIfAnswered(state.other_responses);
+        }
+        if ('student_answer' in response) {
+            textareaStudentAnswer.val(response.student_answer);
+            savedAnswer = response.student_answer;
+        }
+        if ('student_answer_version' in state) {
+            savedVersion = state.student_answer_version;
+        }
+    }
+
+    /**
+     * Run an action on the server and show how the state changed
+     * @param {string} action - save, submit or fetch
+     * @param {Object} data - the action's fields
+     * @param {Function} onSuccess - called with the handler's response
+     * @param {Function} onError - called if the request fails
+     * @returns {undefined} nothing
+     */
+    function updateState(action, data, onSuccess, onError) {
+        data.action = action;
+        // eslint-disable-next-line camelcase
+        data.state_version = stateVersion;
+        $.ajax(urlState, {
+            type: 'POST',
+            data: JSON.stringify(data),
+            success: function updateStateOnSuccess(response) {
+                if (response.status === 'success') {
+                    applyState(response);
+                }
+                onSuccess(response);
+            },
+            error: onError,
+        });
+    }
+
+    /**
+     * Count the code points of a string, as the server does
+     * @param {string} text - any text
+     * @returns {number} the number of code points in text
+     */
+    function codePointLength(text) {
+        return text.length - (text.match(SURROGATE_PAIRS) || []).length;
+    }
+
+    /**
+     * Describe the edit from one answer to another as a single splice
+     * @param {string} before - the answer the server has
+     * @param {string} after - the answer in the textarea
+     * @returns {Object} the characters to replace and their replacement
+     */
+    function makePatch(before, after) {
+        var limit = Math.min(before.length, after.length);
+        var prefix = 0;
+        var suffix = 0;
+        while (prefix < limit && before.charAt(prefix) === after.charAt(prefix)) {
+            prefix += 1;
+        }
+        // Never split a surrogate pair between the kept and changed text
+        if (prefix > 0 && /[\uD800-\uDBFF]/.test(before.charAt(prefix - 1))) {
+            prefix -= 1;
+        }
+        while (
+            suffix < limit - prefix &&
+            before.charAt(before.length - 1 - suffix) === after.charAt(after.length - 1 - suffix)
+        ) {
+            suffix += 1;
+        }
+        if (suffix > 0 && /[\uDC00-\uDFFF]/.test(before.charAt(before.length - suffix))) {
+            suffix -= 1;
+        }
+        return {
+            start: codePointLength(before.slice(0, prefix)),
+            end: codePointLength(before.slice(0, before.length - suffix)),
+            text: after.slice(prefix, after.length - suffix),
+            length: codePointLength(after),
+        };
+    }
+
+    /**
+     * Save the textarea as a draft, sending only what changed since
+     * the last acknowledged save, or everything if the server asks
+     * @param {boolean} whole - send the whole answer
+     * @param {Function} onSuccess - called with the handler's response
+     * @param {Function} onError - called if the save fails
+     * @returns {undefined} nothing
+     */
+    function saveAnswer(whole, onSuccess, onError) {
+        var answer = textareaStudentAnswer.val();
+        var data = {
+            // eslint-disable-next-line camelcase
+            student_answer: answer,
+        };
+        if (!whole) {
+            data = {
+                version: savedVersion,
+                patch: makePatch(savedAnswer, answer),
+            };
+        }
+        updateState('save', data, function saveAnswerOnSuccess(response) {
+            if (response.status === 'resync') {
+                saveAnswer(true, onSuccess, onError);
+                return;
+            }
+            if (response.status === 'closed') {
+                // The server no longer takes drafts, so stop sending them
+                autosaveEnabled = false;
+                onSuccess(response);
+                return;
+            }
+            savedAnswer = answer;
+            onSuccess(response);
+        }, onError);
+    }
+
+    /**
+     * Quietly save the draft if it changed, at most one save at a time
+     * @returns {undefined} nothing
+     */
+    function autosave() {
+        autosaveTimer = null;
+        if (
+            !autosaveEnabled ||
+            buttonSave.hasClass('nodisplay') ||
+            textareaStudentAnswer.val() === savedAnswer
+        ) {
+            return;
+        }
+        if (autosaving) {
+            autosaveTimer = setTimeout(autosave, AUTOSAVE_DELAY);
+            return;
+        }
+        autosaving = true;
+        saveAnswer(false, function autosaveOnSuccess() {
+            autosaving = false;
+        }, function autosaveOnError() {
+            autosaving = false;
+        });
+    }
+
     buttonHide.on('click', function () {
         responseList.toggle();
         buttonHideTextHide.toggle();
@@ -92,41 +292,27 @@ function FreeTextResponseView(runtime, element) {
     });
 
     buttonSubmit.on('click', function () {
+        var answer = textareaStudentAnswer.val();
         buttonSubmit.text(buttonSubmit[0].dataset.checking);
         runtime.notify('submit', {
             message: 'Submitting...',
             state: 'start',
         });
-        $.ajax(url, {
-            type: 'POST',
-            data: JSON.stringify({
-                // eslint-disable-next-line camelcase
-                student_answer: $element.find('.student_answer').val(),
-                // eslint-disable-next-line camelcase
-                can_record_response: $element.find('.messageCheckbox').prop('checked'),
-            }),
-            success: function buttonSubmitOnSuccess(response) {
-                usedAttemptsFeedback.text(response.used_attempts_feedback);
-                buttonSubmit.addClass(response.nodisplay_class);
-                problemProgress.text(response.problem_progress);
-                submissionReceivedMessage.text(response.submitted_message);
-                buttonSubmit.text(buttonSubmit[0].dataset.value);
-                userAlertMessage.text(response.user_alert);
-                buttonSave.addClass(response.nodisplay_class);
-                setClassForTextAreaParent(response.indicator_class);
-                displayResponsesIfAnswered(response);
-
-                $xblocksContainer.data(cachedAnswerId, $element.find('.student_answer').val());
-                $xblocksContainer.data(problemProgressId, response.problem_progress);
-                $xblocksContainer.data(usedAttemptsFeedbackId, response.used_attempts_feedback);
-
-                runtime.notify('submit', {
-                    state: 'end',
-                });
-            },
-            error: function buttonSubmitOnError() {
-                runtime.notify('error', {});
-            },
+        updateState('submit', {
+            // eslint-disable-next-line camelcase
+            student_answer: answer,
+            // eslint-disable-next-line camelcase
+            can_record_response: $element.find('.messageCheckbox').prop('checked'),
+        }, function buttonSubmitOnSuccess(response) {
+            savedAnswer = answer;
+            submissionReceivedMessage.text(response.submitted_message);
+            buttonSubmit.text(buttonSubmit[0].dataset.value);
+            userAlertMessage.text(response.user_alert);
+            runtime.notify('submit', {
+                state: 'end',
+            });
+        }, function buttonSubmitOnError() {
+            runtime.notify('error', {});
         });
         return false;
     });
@@ -137,32 +323,15 @@ function FreeTextResponseView(runtime, element) {
             message: 'Saving...',
             state: 'start',
         });
-        $.ajax(urlSave, {
-            type: 'POST',
-            data: JSON.stringify({
-                // eslint-disable-next-line camelcase
-                student_answer: $element.find('.student_answer').val(),
-            }),
-            success: function buttonSaveOnSuccess(response) {
-                buttonSubmit.addClass(response.nodisplay_class);
-                buttonSave.addClass(response.nodisplay_class);
-                usedAttemptsFeedback.text(response.used_attempts_feedback);
-                problemProgress.text(response.problem_progress);
-                submissionReceivedMessage.text(response.submitted_message);
-                buttonSave.text(buttonSave[0].dataset.value);
-                userAlertMessage.text(response.user_alert);
-
-                $xblocksContainer.data(cachedAnswerId, $element.find('.student_answer').val());
-                $xblocksContainer.data(problemProgressId, response.problem_progress);
-                $xblocksContainer.data(usedAttemptsFeedbackId, response.used_attempts_feedback);
-
-                runtime.notify('save', {
-                    state: 'end',
-                });
-            },
-            error: function buttonSaveOnError() {
-                runtime.notify('error', {});
-            },
+        saveAnswer(false, function buttonSaveOnSuccess(response) {
+            submissionReceivedMessage.text(response.submitted_message);
+            buttonSave.text(buttonSave[0].dataset.value);
+            userAlertMessage.text(response.user_alert);
+            runtime.notify('save', {
+                state: 'end',
+            });
+        }, function buttonSaveOnError() {
+            runtime.notify('error', {});
         });
         return false;
     });
@@ -174,4 +343,27 @@ function FreeTextResponseView(runtime, element) {
         userAlertMessage.text('');
         setClassForTextAreaParent('unanswered');
     });
+
+    textareaStudentAnswer.on('input', function () {
+        if (!autosaveEnabled) {
+            return;
+        }
+        clearTimeout(autosaveTimer);
+        autosaveTimer = setTimeout(autosave, AUTOSAVE_DELAY);
+    });
+
+    // The page may show this view as it was first rendered, for
+    // instance when navigating back within a sequence, so bring it up
+    // to date if another view of the block has seen a later state, or
+    // if that cannot be known.
+    var recordedVersion = storageKey ? getRecordedVersion() : null;
+    if (!storageKey || (recordedVersion !== null && recordedVersion !== stateVersion)) {
+        updateState('fetch', {}, function fetchOnSuccess() {
+            return undefined;
+        }, function fetchOnError() {
+            return undefined;
+        });
+    } else {
+        recordVersion();
+    }
 }
@@ -0,0 +1,199 @@
+"""
+Publish grade events to the XBlock runtime
+"""
+from __future__ import absolute_import
+
+import atexit
+from collections import OrderedDict
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.db import IntegrityError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from six import text_type
+
+from .instrumentation import incr
+from .instrumentation import timer
+
+
+LOG = logging.getLogger(__name__)
+# Seconds a deferred grade waits for later grades to coalesce with
+PUBLISH_DELAY = 2
+
+_PUBLISHER = {}
+
+try:
+    from lms.djangoapps.courseware.model_data import set_score
+    from lms.djangoapps.grades.constants import ScoreDatabaseTableEnum
+    from lms.djangoapps.grades.signals.signals import (
+        PROBLEM_RAW_SCORE_CHANGED,
+    )
+except ImportError:  # pragma: no cover
+    set_score = None
+    ScoreDatabaseTableEnum = None
+    PROBLEM_RAW_SCORE_CHANGED = None
+
+
+class GradePublisher(object):
+    """
+    Publish grades synchronously, through the block's runtime
+    """
+
+    def publish(self, block, grade):
+        """
+        Publish a grade event for the block
+
+        An IntegrityError, from a concurrent write to the grade tables,
+        drops the event, as it always has.
+        """
+        try:
+            with timer('publish_grade'):
+                block.runtime.publish(block, 'grade', grade)
+        except IntegrityError:
+            incr('publish_grade_conflicts')
+
+
+def store_score(score):
+    """
+    Store a queued score as edx-platform stores a block's grade event
+
+    The learner's StudentModule gets the score, and
+    PROBLEM_RAW_SCORE_CHANGED brings their persistent grades up to date.
+    """
+    usage_id = score['usage_id']
+    set_score(
+        score['user_id'],
+        usage_id,
+        score['raw_earned'],
+        score['raw_possible'],
+    )
+    PROBLEM_RAW_SCORE_CHANGED.send(
+        sender=None,
+        raw_earned=score['raw_earned'],
+        raw_possible=score['raw_possible'],
+        weight=score['weight'],
+        user_id=score['user_id'],
+        course_id=text_type(usage_id.course_key),
+        usage_id=text_type(usage_id),
+        only_if_higher=False,
+        modified=score['modified'],
+        score_db_table=ScoreDatabaseTableEnum.courseware_student_module,
+        score_deleted=False,
+    )
+
+
+class DeferredGradePublisher(GradePublisher):
+    """
+    Queue grades and store them shortly after, off the request thread
+
+    Grades wait FREETEXTRESPONSE_GRADE_PUBLISH_DELAY seconds, then a
+    timer thread stores them, so handler latency does not depend on
+    the grade tables. Repeated grades for the same learner and block
+    within that window, from any request, are coalesced, and only the
+    latest one is stored. Grades still queued when the process exits
+    are stored then, so management commands and task workers do not
+    lose them.
+
+    Only plain data is queued, never the block or its runtime, which
+    belong to the request that loaded them; the queued scores are
+    handed to store, store_score by default. Outside edx-platform there
+    is no such default, and grades are published synchronously instead.
+    """
+
+    def __init__(self, delay=None, store=None):
+        if delay is None:
+            delay = getattr(
+                settings,
+                'FREETEXTRESPONSE_GRADE_PUBLISH_DELAY',
+                PUBLISH_DELAY,
+            )
+        if store is None and set_score is not None:
+            store = store_score  # pragma: no cover
+        self.delay = delay
+        self.store = store
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def publish(self, block, grade):
+        """
+        Queue the score in a grade event for the block
+        """
+        if self.store is None:
+            super(DeferredGradePublisher, self).publish(block, grade)
+            return
+        scope_ids = block.scope_ids
+        score = {
+            'user_id': scope_ids.user_id,
+            'usage_id': scope_ids.usage_id,
+            'weight': getattr(block, 'weight', None),
+            'raw_earned': grade['value'],
+            'raw_possible': grade['max_value'],
+            'modified': timezone.now(),
+        }
+        key = (text_type(scope_ids.usage_id), text_type(scope_ids.user_id))
+        with self._lock:
+            if self._pending.pop(key, None) is not None:
+                incr('grades_coalesced')
+            self._pending[key] = score
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """
+        Store every queued score
+
+        A score that fails to be stored is logged, and the others are
+        still stored.
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = OrderedDict()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for score in pending.values():
+            try:
+                with timer('publish_grade'):
+                    self.store(score)
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception(
+                    'Could not store score %r for %s',
+                    score['raw_earned'],
+                    score['usage_id'],
+                )
+
+    def _on_timer(self):
+        """
+        Flush queued scores, then close the timer thread's connections
+        """
+        try:
+            self.flush()
+        finally:
+            for connection in connections.all():
+                connection.close()
+
+
+def get_grade_publisher():
+    """
+    Return the process-wide grade publisher
+
+    The FREETEXTRESPONSE_GRADE_PUBLISHER Django setting may name
+    another publisher class by dotted path; grades are published
+    synchronously otherwise.
+    """
+    publisher = _PUBLISHER.get('publisher')
+    if publisher is None:
+        path = getattr(settings, 'FREETEXTRESPONSE_GRADE_PUBLISHER', None)
+        publisher_class = GradePublisher
+        if path:
+            publisher_class = import_string(path)
+        publisher = publisher_class()
+        _PUBLISHER['publisher'] = publisher
+    return publisher
@@ -0,0 +1,175 @@
+"""
+Regrade stored answers after a block's grading settings change
+"""
+from __future__ import absolute_import
+
+import json
+
+from .evaluation import get_grading_settings
+from .evaluation import grade_answers
+from .fields import decompress_text
+from .models import Credit
+
+
+BATCH_SIZE = 1000
+
+try:
+    from lms.djangoapps.courseware.models import StudentModule
+    from lms.djangoapps.grades.signals.signals import SCORE_PUBLISHED
+except ImportError:  # pragma: no cover
+    StudentModule = None
+    SCORE_PUBLISHED = None
+
+
+def iter_batches(iterable, batch_size=BATCH_SIZE):
+    """
+    Split an iterable into lists of at most batch_size items
+
+    Only one batch is held in memory at a time.
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def get_submitted_answer(state):
+    """
+    Returns the answer a stored state was last scored on, or None if a
+    draft has replaced it since
+
+    States stored before submitted_answer_version was kept are scored on
+    their latest answer, which may be a later draft, but is the best
+    there is.
+    """
+    submitted = state.get('submitted_answer_version')
+    if submitted is not None:
+        if submitted != state.get('student_answer_version', 0):
+            return None
+    result = decompress_text(state.get('student_answer', ''))
+    return result
+
+
+def regrade_states(block, states, batch_size=BATCH_SIZE):
+    """
+    Rescore stored learner states against the block's current settings
+
+    states is an iterable of (key, state) pairs, where state is the
+    block's user_state as a dict. Only states with a submission are
+    scored, on the answer submitted; states whose answer has been
+    replaced by a draft since keep the score they have. Yields, per
+    batch, the number of states read and a list of (key, state) pairs
+    whose score changed, with the new score already written into state.
+    """
+    settings = get_grading_settings(block)
+    for batch in iter_batches(states, batch_size):
+        changed = []
+        submitted = [
+            (key, state, get_submitted_answer(state))
+            for key, state in batch
+            if state.get('count_attempts', 0) > 0
+        ]
+        submitted = [item for item in submitted if item[2] is not None]
+        grades = grade_answers(
+            settings,
+            (answer for _key, _state, answer in submitted),
+        )
+        for (key, state, _answer), grade in zip(submitted, grades):
+            score = grade.credit.value
+            if score != state.get('score', 0.0):
+                state['score'] = score
+                changed.append((key, state))
+        yield len(batch), changed
+
+
+class StudentModuleStates(object):
+    """
+    Read and write freetextresponse learner states in edx-platform
+    """
+
+    def __init__(self, usage_key):
+        if StudentModule is None:
+            raise RuntimeError(
+                'Regrading stored answers requires edx-platform'
+            )
+        self.usage_key = usage_key
+
+    def __iter__(self):
+        """
+        Stream (StudentModule, state) pairs for the block
+
+        No cursor is held open across batches, so the states can be
+        saved while they are read.
+        """
+        for module in self._iter_pages(
+                StudentModule.objects.select_related('student'),
+        ):
+            yield module, json.loads(module.state or '{}')
+
+    def iter_learner_states(self, batch_size=BATCH_SIZE):
+        """
+        Stream (user_id, username, state) rows for the block
+        """
+        rows = self._iter_pages(
+            StudentModule.objects.values_list(
+                'pk',
+                'student_id',
+                'student__username',
+                'state',
+            ),
+            batch_size,
+            pk=lambda row: row[0],
+        )
+        for _pk, user_id, username, state in rows:
+            yield user_id, username, json.loads(state or '{}')
+
+    def _iter_pages(self, queryset, batch_size=BATCH_SIZE, pk=None):
+        """
+        Stream the block's rows from queryset, in primary key order
+
+        Rows are read batch_size at a time, each page starting after the
+        last primary key of the one before, so memory use does not grow
+        with the number of learners, whatever the database driver
+        buffers.
+        """
+        pk = pk or (lambda row: row.pk)
+        rows = queryset.filter(
+            module_state_key=self.usage_key,
+        ).order_by('pk')
+        last_pk = None
+        while True:
+            page = rows
+            if last_pk is not None:
+                page = page.filter(pk__gt=last_pk)
+            page = list(page[:batch_size])
+            for row in page:
+                yield row
+            if len(page) < batch_size:
+                break
+            last_pk = pk(page[-1])
+
+    @staticmethod
+    def save(block, changed):
+        """
+        Store new scores for a batch of changed states, and publish them
+
+        Scores are published with SCORE_PUBLISHED, as the LMS does with
+        the grade events blocks publish, so the learners' persistent
+        subsection and course grades are brought up to date as well.
+        """
+        for module, state in changed:
+            module.state = json.dumps(state)
+            module.save(update_fields=['state'])
+            SCORE_PUBLISHED.send(
+                sender=None,
+                block=block,
+                user=module.student,
+                raw_earned=state['score'],
+                raw_possible=Credit.full.value,
+                only_if_higher=False,
+                score_deleted=False,
+            )
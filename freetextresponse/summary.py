@@ -0,0 +1,167 @@
+"""
+Update fields shared by every learner of a block without losing writes
+
+Fields in Scope.user_state_summary are loaded once per request and
+written back whole, so two learners submitting at once would each erase
+the other's change. update_summary_field instead reads the stored value
+from the block's field data and writes the new value only if nobody
+changed it meanwhile (compare-and-set), starting over from the newer
+value otherwise. No lock is held while the new value is computed.
+
+The compare-and-set holds one of a few process-wide locks, which is
+enough for the single-process runtimes, such as the workbench, that
+keep field data in memory. Where field data is cached per request, as
+in edx-platform, or cannot be reached, it is no better than a plain
+write of the field.
+"""
+from __future__ import absolute_import
+
+import logging
+import threading
+
+from six import text_type
+from xblock.exceptions import NoSuchServiceError
+from xblock.field_data import FieldData
+
+from .instrumentation import incr
+
+
+LOG = logging.getLogger(__name__)
+LOCK_COUNT = 64
+MAX_UPDATE_ATTEMPTS = 20
+
+_STORE = {}
+
+
+def _get_field_data(block):
+    """
+    Return the FieldData the block's fields are stored in, or None
+
+    The runtime's field-data service is preferred; blocks given their
+    field data directly, as older runtimes do, only have it as
+    _field_data.
+    """
+    try:
+        field_data = block.runtime.service(block, 'field-data')
+    except NoSuchServiceError:
+        field_data = None
+    if not isinstance(field_data, FieldData):
+        # pylint: disable=protected-access
+        field_data = getattr(block, '_field_data', None)
+    if not isinstance(field_data, FieldData):
+        return None
+    return field_data
+
+
+class FieldDataSummaryStore(object):
+    """
+    Compare-and-set summary fields through the block's field data
+
+    Blocks whose field data cannot be reached read and write the
+    field itself instead.
+    """
+
+    def __init__(self, lock_count=LOCK_COUNT):
+        self._locks = [threading.Lock() for _ in range(lock_count)]
+
+    def read(self, block, name):
+        """
+        Return the stored JSON value of a field, and a token to pass to
+        compare_and_set
+        """
+        field_data = _get_field_data(block)
+        if field_data is None:
+            value = block.fields[name].read_json(block)
+        else:
+            try:
+                value = field_data.get(block, name)
+            except KeyError:
+                value = None
+        return value, value
+
+    def compare_and_set(self, block, name, token, value):
+        """
+        Store the JSON value of a field, unless it changed since token
+        was read
+
+        Returns whether the value was stored.
+        """
+        key = (text_type(block.scope_ids.usage_id), name)
+        with self._locks[hash(key) % len(self._locks)]:
+            current, _token = self.read(block, name)
+            if current != token:
+                return False
+            field_data = _get_field_data(block)
+            if field_data is None:
+                field = block.fields[name]
+                setattr(block, name, field.from_json(value))
+            else:
+                field_data.set(block, name, value)
+        return True
+
+
+def get_summary_store():
+    """
+    Return the process-wide summary field store
+    """
+    store = _STORE.get('store')
+    if store is None:
+        store = FieldDataSummaryStore()
+        _STORE['store'] = store
+    return store
+
+
+def _refresh_field(block, field, value):
+    """
+    Make value the block's copy of the field, as though just loaded
+
+    The copy must not count as changed, or saving the block would write
+    it back over whatever other learners store later. XBlock offers no
+    public way to do that, so blocks without the Field and XBlock
+    internals relied on here are given the value as a plain write.
+    """
+    # pylint: disable=protected-access
+    dirty_fields = getattr(block, '_dirty_fields', None)
+    if not hasattr(field, '_set_cached_value') or \
+            not isinstance(dirty_fields, dict):
+        setattr(block, field.name, value)
+        return
+    field._set_cached_value(block, value)
+    dirty_fields.pop(field, None)
+
+
+def update_summary_field(block, name, function, store=None):
+    """
+    Replace the stored value of a summary field with function(value)
+
+    function gets the stored value, as the field's Python value, and
+    returns the new one, or None to leave it as it is. It is called
+    again with the newer value whenever another writer got there
+    first, so it must not have side effects. The block's own copy of
+    the field becomes the value now stored, which is returned, or None
+    if it could not be written.
+    """
+    store = store or get_summary_store()
+    field = block.fields[name]
+    for _attempt in range(MAX_UPDATE_ATTEMPTS):
+        stored, token = store.read(block, name)
+        if stored is None:
+            current = field.default
+        else:
+            current = field.from_json(stored)
+        value = function(current)
+        if value is None:
+            value = current
+        elif not store.compare_and_set(
+                block, name, token, field.to_json(value)):
+            incr('summary_update_conflicts')
+            continue
+        _refresh_field(block, field, value)
+        return value
+    LOG.error(
+        'Could not update %s for %s after %d attempts',
+        name,
+        block.scope_ids.usage_id,
+        MAX_UPDATE_ATTEMPTS,
+    )
+    return None
@@ -0,0 +1,684 @@
+"""
+Benchmark the FreeTextResponse scoring and rendering hot paths
+
+Run from the repository root with:
+
+    make benchmark
+
+Each case is timed and compared against benchmark_baseline.json;
+the run fails if any case is slower than its baseline by more than
+the tolerance, give or take a few microseconds of timer noise.
+Timings are machine-specific, so regenerate the baseline
+(--save-baseline) on the machine that enforces it.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import json
+from multiprocessing.dummy import Pool as ThreadPool
+import os
+import random
+import sys
+import timeit
+
+import django
+
+from mock import Mock
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'benchmark_baseline.json',
+)
+ANSWER_SIZES = (10, 100, 1000, 10000)
+COMPRESSION_SIZES = (1000, 10000)
+BATCH_SIZE = 1000
+BLOCK_COUNTS = (1, 20)
+MATCHING_MODES = ('normalized', 'whole_words', 'fuzzy')
+PHRASE_COUNTS = (1, 10, 100, 1000)
+MIN_RUN_SECONDS = 0.05
+# Timer noise allowed on top of the tolerance, which alone is too
+# strict for cases that take a few microseconds
+NOISE_SECONDS = 5e-6
+POOL_MEMORY_SIZE = 10000
+REPEAT = 5
+STORE_STUDENT_COUNT = 40
+STORE_THREAD_COUNTS = (1, 8)
+TOLERANCE = 0.5
+VOCABULARY_SIZE = 5000
+
+
+def make_vocabulary(size=VOCABULARY_SIZE, seed=0):
+    """
+    Build a reproducible list of made-up words
+    """
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [
+        ''.join(rng.choice(letters) for _ in range(rng.randint(2, 10)))
+        for _ in range(size)
+    ]
+
+
+def make_answer(word_count, vocabulary, seed=1):
+    """
+    Build a reproducible answer of word_count words
+    """
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(vocabulary) for _ in range(word_count))
+
+
+def make_phrases(count, vocabulary, seed=2):
+    """
+    Build key phrases that never occur in generated answers, so every
+    phrase has to be checked
+    """
+    rng = random.Random(seed)
+    return [
+        '{} {}q'.format(rng.choice(vocabulary), rng.choice(vocabulary))
+        for _ in range(count)
+    ]
+
+
+def make_runtime():
+    """
+    Create a minimal runtime
+    """
+    # pylint: disable=import-error
+    from xblock.runtime import NullI18nService
+
+    runtime = Mock(
+        service=Mock(return_value=NullI18nService()),
+        local_resource_url=Mock(return_value='/static/asset'),
+        publish=Mock(return_value=None),
+    )
+    return runtime
+
+
+def make_xblock(runtime=None, usage_id='usage', **kw):
+    """
+    Create a FreeTextResponse XBlock with a minimal runtime
+    """
+    # pylint: disable=import-error
+    from xblock.field_data import DictFieldData
+    from xblock.fields import ScopeIds
+    from freetextresponse.xblocks import FreeTextResponse
+
+    runtime = runtime or make_runtime()
+    scope_ids = ScopeIds('student', 'freetextresponse', 'def', usage_id)
+    xblock = FreeTextResponse(runtime, DictFieldData(kw), scope_ids)
+    return xblock
+
+
+def store_concurrently(answer, thread_pool, count=STORE_STUDENT_COUNT):
+    """
+    Add count students to one shared pool from the threads of
+    thread_pool
+    """
+    # pylint: disable=import-error
+    from xblock.fields import ScopeIds
+    from xblock.runtime import DictKeyValueStore
+    from xblock.runtime import KvsFieldData
+    from freetextresponse.xblocks import FreeTextResponse
+
+    runtime = make_runtime()
+    field_data = KvsFieldData(DictKeyValueStore())
+    xblocks = []
+    for index in range(count):
+        xblock = FreeTextResponse(
+            runtime,
+            field_data,
+            ScopeIds(index, 'freetextresponse', 'def', 'usage'),
+        )
+        xblock.student_answer = answer
+        xblock.score = 1.0
+        xblock.get_student_id = lambda index=index: 'student-{}'.format(
+            index,
+        )
+        xblocks.append(xblock)
+    thread_pool.map(lambda xblock: xblock.store_student_response(), xblocks)
+
+
+class Request(object):
+    """
+    A minimal request for calling JSON handlers
+    """
+    method = 'POST'
+
+    def __init__(self, data):
+        self.body = json.dumps(data).encode('utf-8')
+
+
+def make_scoring_run(xblock, method):
+    """
+    Time a scoring helper without its per-answer memoization
+    """
+    def run():
+        """
+        Score the answer from scratch
+        """
+        xblock._evaluation = None  # pylint: disable=protected-access
+        method()
+    return run
+
+
+def build_scoring_cases(vocabulary):
+    """
+    Return cases scoring answers of every size against key phrases
+    """
+    # pylint: disable=protected-access
+    cases = []
+    for word_count in ANSWER_SIZES:
+        answer = make_answer(word_count, vocabulary)
+        xblock = make_xblock(student_answer=answer)
+        cases.append((
+            'word_count_valid/words={}'.format(word_count),
+            make_scoring_run(xblock, xblock._word_count_valid),
+        ))
+        for phrase_count in PHRASE_COUNTS:
+            phrases = make_phrases(phrase_count, vocabulary)
+            xblock = make_xblock(
+                student_answer=answer,
+                fullcredit_keyphrases=phrases[::2],
+                halfcredit_keyphrases=phrases[1::2],
+            )
+            cases.append((
+                'determine_credit/words={}/phrases={}'.format(
+                    word_count,
+                    phrase_count,
+                ),
+                make_scoring_run(xblock, xblock._determine_credit),
+            ))
+
+    return cases
+
+
+def build_matching_cases(vocabulary):
+    """
+    Return cases for each way of matching key phrases
+    """
+    # pylint: disable=import-error,protected-access
+    from freetextresponse.keyphrases import FuzzyMatcher
+
+    cases = []
+    for matching in MATCHING_MODES:
+        phrases = make_phrases(100, vocabulary)
+        for word_count in ANSWER_SIZES:
+            xblock = make_xblock(
+                student_answer=make_answer(word_count, vocabulary),
+                fullcredit_keyphrases=phrases[::2],
+                halfcredit_keyphrases=phrases[1::2],
+                keyphrase_matching=matching,
+            )
+            cases.append((
+                'determine_credit/words={}/phrases=100/{}'.format(
+                    word_count,
+                    matching,
+                ),
+                make_scoring_run(xblock, xblock._determine_credit),
+            ))
+
+    # Tolerant matching remembers the answer words it has checked, so
+    # also time a matcher that has never seen the answer before.
+    for word_count in ANSWER_SIZES:
+        answer = make_answer(word_count, vocabulary)
+        phrases = make_phrases(100, vocabulary)
+        cases.append((
+            'determine_credit/words={}/phrases=100/fuzzy_cold'.format(
+                word_count,
+            ),
+            lambda answer=answer, phrases=phrases: FuzzyMatcher(
+                phrases[::2],
+                phrases[1::2],
+            ).determine_credit(answer),
+        ))
+
+    # An answer of nothing but words the matcher has not seen is the
+    # most any one answer can cost it.
+    distinct_words = sorted(set(make_vocabulary(20000, seed=3)))[:10000]
+    distinct_answer = ' '.join(distinct_words)
+    distinct_phrases = make_phrases(300, vocabulary)
+    distinct_matcher = FuzzyMatcher(
+        distinct_phrases[::2],
+        distinct_phrases[1::2],
+    )
+
+    def score_unseen_words():
+        """
+        Score the answer with a matcher that remembers none of its words
+        """
+        distinct_matcher._word_matches.clear()
+        distinct_matcher.determine_credit(distinct_answer)
+    cases.append((
+        'determine_credit/words=10000/phrases=300/fuzzy_distinct',
+        score_unseen_words,
+    ))
+    return cases
+
+
+def build_grading_cases(vocabulary):
+    """
+    Return cases grading a batch of answers
+    """
+    # pylint: disable=import-error,protected-access
+    from freetextresponse.evaluation import get_grading_settings
+    from freetextresponse.evaluation import grade_batch
+
+    cases = []
+    batch_answers = [
+        make_answer(100, vocabulary, seed=index)
+        for index in range(BATCH_SIZE)
+    ]
+    batch_phrases = make_phrases(10, vocabulary)
+    batch_xblock = make_xblock(
+        fullcredit_keyphrases=batch_phrases[::2],
+        halfcredit_keyphrases=batch_phrases[1::2],
+    )
+
+    def grade_one_at_a_time():
+        """
+        Score a batch of answers through a block, one answer at a time
+        """
+        for answer in batch_answers:
+            batch_xblock.student_answer = answer
+            batch_xblock._determine_credit()
+    cases.append((
+        'grade/answers={}/per_block'.format(BATCH_SIZE),
+        grade_one_at_a_time,
+    ))
+    cases.append((
+        'grade/answers={}/grade_batch'.format(BATCH_SIZE),
+        lambda: grade_batch(
+            get_grading_settings(batch_xblock),
+            batch_answers,
+        ),
+    ))
+    return cases
+
+
+def build_storage_cases(vocabulary):
+    """
+    Return cases compressing and inflating stored answers
+    """
+    # pylint: disable=import-error
+    from freetextresponse.fields import compress_text
+    from freetextresponse.fields import decompress_text
+
+    cases = []
+    for word_count in COMPRESSION_SIZES:
+        answer = make_answer(word_count, vocabulary)
+        stored = compress_text(answer, 0)
+        cases.append((
+            'storage/words={}/compress'.format(word_count),
+            lambda answer=answer: compress_text(answer, 0),
+        ))
+        cases.append((
+            'storage/words={}/inflate'.format(word_count),
+            lambda stored=stored: decompress_text(stored),
+        ))
+    return cases
+
+
+def build_rendering_cases(vocabulary):
+    """
+    Return cases rendering pages of student views
+    """
+    cases = []
+    for block_count in BLOCK_COUNTS:
+        runtime = make_runtime()
+        page = [
+            make_xblock(
+                runtime,
+                usage_id='usage-{}'.format(index),
+                student_answer=make_answer(100, vocabulary, seed=index),
+            )
+            for index in range(block_count)
+        ]
+        cases.append((
+            'student_view/blocks={}/each'.format(block_count),
+            lambda page=page: [xblock.student_view() for xblock in page],
+        ))
+    return cases
+
+
+def build_pool_cases(vocabulary):
+    """
+    Return cases adding to and reading the response pool
+    """
+    cases = []
+    pool_xblock = make_xblock(
+        student_answer=make_answer(100, vocabulary),
+        score=1.0,
+        display_other_student_responses=True,
+    )
+    student_ids = ['student-{}'.format(index) for index in range(1000)]
+
+    def store_student_response():
+        """
+        Add one more student to a busy pool
+        """
+        student_id = student_ids.pop() if student_ids else 'student'
+        pool_xblock.get_student_id = lambda: student_id
+        pool_xblock.store_student_response()
+    cases.append(('store_student_response', store_student_response))
+    answer = make_answer(100, vocabulary)
+    for thread_count in STORE_THREAD_COUNTS:
+        # Threads are started once, so only the stores are timed
+        thread_pool = ThreadPool(thread_count)
+        cases.append((
+            'store_student_response/students={}/threads={}'.format(
+                STORE_STUDENT_COUNT,
+                thread_count,
+            ),
+            lambda thread_pool=thread_pool: store_concurrently(
+                answer,
+                thread_pool,
+            ),
+        ))
+    cases.append(('get_other_answers', pool_xblock.get_other_answers))
+    return cases
+
+
+def build_handler_cases(vocabulary):
+    """
+    Return cases calling the student view and its handlers
+    """
+    cases = []
+    for word_count in (100, 10000):
+        answer = make_answer(word_count, vocabulary)
+        phrases = make_phrases(100, vocabulary)
+        xblock = make_xblock(
+            student_answer=answer,
+            fullcredit_keyphrases=phrases,
+            display_other_student_responses=True,
+        )
+        cases.append((
+            'provide_context/words={}'.format(word_count),
+            xblock.provide_context,
+        ))
+        cases.append((
+            'student_view/words={}'.format(word_count),
+            xblock.student_view,
+        ))
+        finished_xblock = make_xblock(
+            student_answer=answer,
+            fullcredit_keyphrases=phrases,
+            display_other_student_responses=True,
+            max_attempts=1,
+            count_attempts=1,
+        )
+        cases.append((
+            'student_view/words={}/finished'.format(word_count),
+            finished_xblock.student_view,
+        ))
+        request = Request({
+            'student_answer': answer,
+            'can_record_response': True,
+        })
+        fetch = Request({
+            'action': 'fetch',
+            'state_version': xblock.get_state_version(),
+        })
+        cases.append((
+            'student_state/words={}/fetch'.format(word_count),
+            lambda xblock=xblock, request=fetch: xblock.student_state(request),
+        ))
+        cases.append((
+            'submit/words={}'.format(word_count),
+            lambda xblock=xblock, request=request: xblock.submit(request),
+        ))
+        save_xblock = make_xblock(student_answer=answer)
+        drafts = [
+            Request({'student_answer': answer}),
+            Request({'student_answer': answer + ' word'}),
+        ]
+        cases.append((
+            'save_reponse/words={}/whole'.format(word_count),
+            lambda xblock=save_xblock, drafts=drafts: xblock.save_reponse(
+                drafts[1 - xblock.student_answer_version % 2],
+            ),
+        ))
+
+        state_xblock = make_xblock(
+            student_answer=answer,
+            fullcredit_keyphrases=phrases,
+            display_other_student_responses=True,
+        )
+        state_drafts = [
+            Request({
+                'action': 'save',
+                'state_version': state_xblock.get_state_version(),
+                'student_answer': draft,
+            })
+            for draft in (answer, answer + ' word')
+        ]
+        cases.append((
+            'student_state/words={}/save'.format(word_count),
+            lambda xblock=state_xblock, drafts=state_drafts:
+            xblock.student_state(
+                drafts[1 - xblock.student_answer_version % 2],
+            ),
+        ))
+
+        def save_patch(xblock=save_xblock, length=len(answer)):
+            """
+            Save a one-word edit to the end of the draft, or undo it, as
+            autosave does
+            """
+            version = xblock.student_answer_version
+            added = version % 2
+            request = Request({
+                'version': version,
+                'patch': {
+                    'start': length,
+                    'end': length + 5 * added,
+                    'text': ' word' * (1 - added),
+                    'length': length + 5 * (1 - added),
+                },
+            })
+            xblock.save_reponse(request)
+        cases.append((
+            'save_reponse/words={}/patch'.format(word_count),
+            save_patch,
+        ))
+    return cases
+
+
+def build_cases():
+    """
+    Return a list of (name, callable) pairs to time
+    """
+    vocabulary = make_vocabulary()
+    cases = []
+    builders = (
+        build_scoring_cases,
+        build_matching_cases,
+        build_grading_cases,
+        build_storage_cases,
+        build_rendering_cases,
+        build_pool_cases,
+        build_handler_cases,
+    )
+    for build in builders:
+        cases.extend(build(vocabulary))
+    return cases
+
+
+def build_memory_cases():
+    """
+    Return a list of (name, callable) pairs whose result is a size in
+    bytes
+    """
+    # pylint: disable=import-error
+    from freetextresponse.fields import compress_text
+    from freetextresponse.pool import Response
+
+    def stored(student_id, answer):
+        """
+        Return an entry in its stored form
+        """
+        return {'student_id': student_id, 'answer': answer}
+
+    cases = [
+        ('memory/pool_entry/dict', lambda: pool_entry_bytes(stored)),
+        ('memory/pool_entry/record', lambda: pool_entry_bytes(Response)),
+    ]
+    vocabulary = make_vocabulary()
+    for word_count in COMPRESSION_SIZES:
+        answer = make_answer(word_count, vocabulary)
+        cases.append((
+            'storage/words={}/plain'.format(word_count),
+            lambda answer=answer: stored_bytes(answer),
+        ))
+        cases.append((
+            'storage/words={}/zlib'.format(word_count),
+            lambda answer=answer: stored_bytes(compress_text(answer, 0)),
+        ))
+    return cases
+
+
+def stored_bytes(value):
+    """
+    Return the size of a field value once serialized into user state
+    """
+    return float(len(json.dumps(value).encode('utf-8')))
+
+
+def pool_entry_bytes(make_entry, size=POOL_MEMORY_SIZE, copies=2):
+    """
+    Return the bytes allocated per entry for copies of a pool of size
+    entries, with student ids decoded afresh for each copy, as when
+    several block instances load the pool
+    """
+    answer = 'a shared answer'
+    tracemalloc.start()
+    pools = []
+    for _ in range(copies):
+        pools.append([
+            make_entry(''.join(['student-', str(index)]), answer)
+            for index in range(size)
+        ])
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return float(allocated) / (size * copies)
+
+
+def time_case(function):
+    """
+    Return the best observed seconds per call of function
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < MIN_RUN_SECONDS and number < 1000000:
+        number *= 10
+    best = min(timer.repeat(repeat=REPEAT, number=number))
+    return best / number
+
+
+def load_baseline(path=BASELINE_PATH):
+    """
+    Load the stored baseline timings
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file_input:
+        return json.load(file_input)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    """
+    Store timings as the new baseline
+    """
+    with open(path, 'w') as file_output:
+        json.dump(results, file_output, indent=4, sort_keys=True)
+        file_output.write('\n')
+
+
+def compare(results, baseline, tolerance=TOLERANCE, noise=0):
+    """
+    Return the names of cases worse than baseline by over tolerance,
+    plus noise
+    """
+    return [
+        name
+        for name, value in sorted(results.items())
+        if name in baseline
+        and value > baseline[name] * (1 + tolerance) + noise
+    ]
+
+
+def main(argv=None):
+    """
+    Run the benchmarks and report them against the baseline
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--filter',
+        default='',
+        help='Only run cases whose name contains this text',
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=TOLERANCE,
+        help='Allowed slowdown against the baseline, as a fraction',
+    )
+    parser.add_argument(
+        '--save-baseline',
+        action='store_true',
+        help='Store this run as the new baseline',
+    )
+    options = parser.parse_args(argv)
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE',
+        'freetextresponse.settings',
+    )
+    django.setup()
+    baseline = load_baseline()
+    timings = {}
+    sizes = {}
+    for name, function in build_cases():
+        if options.filter not in name:
+            continue
+        seconds = time_case(function)
+        timings[name] = seconds
+        line = '{:<45} {:>12.1f} us'.format(name, seconds * 1e6)
+        if name in baseline:
+            line += '  {:>6.2f}x baseline'.format(seconds / baseline[name])
+        print(line)
+    for name, function in build_memory_cases():
+        if options.filter not in name:
+            continue
+        if tracemalloc is None and name.startswith('memory/'):
+            continue
+        size = function()
+        sizes[name] = size
+        line = '{:<45} {:>12.1f} B'.format(name, size)
+        if name in baseline:
+            line += '  {:>6.2f}x baseline'.format(size / baseline[name])
+        print(line)
+    if options.save_baseline:
+        baseline.update(timings)
+        baseline.update(sizes)
+        save_baseline(baseline)
+        print('Baseline saved to {}'.format(BASELINE_PATH))
+        return 0
+    regressions = compare(
+        timings,
+        baseline,
+        options.tolerance,
+        NOISE_SECONDS,
+    ) + compare(sizes, baseline, options.tolerance)
+    for name in regressions:
+        print('REGRESSION: {}'.format(name))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
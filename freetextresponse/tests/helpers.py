@@ -0,0 +1,68 @@
+"""
+Helpers shared by the Free-text Response XBlock tests
+"""
+from mock import Mock
+
+from opaque_keys.edx.locations import SlashSeparatedCourseKey
+
+from xblock.field_data import DictFieldData
+from xblock.fields import ScopeIds
+from xblock.runtime import DictKeyValueStore
+from xblock.runtime import KvsFieldData
+
+from .freetextresponse import FreeTextResponse
+
+
+class TestRequest(object):
+    # pylint: disable=too-few-public-methods
+    """
+    Module helper for @json_handler
+    """
+    method = None
+    body = None
+    success = None
+
+
+def make_an_xblock(**kw):
+    """
+    Helper method that creates a Free-text Response XBlock
+    """
+    course_id = SlashSeparatedCourseKey('foo', 'bar', 'baz')
+    runtime = Mock(
+        course_id=course_id,
+        service=Mock(
+            # Is there a cleaner mock to the `i18n` service?
+            return_value=Mock(_catalog={}),
+        ),
+    )
+    scope_ids = Mock()
+    field_data = DictFieldData(kw)
+    xblock = FreeTextResponse(runtime, field_data, scope_ids)
+    xblock.xmodule_runtime = runtime
+    return xblock
+
+
+def make_xblocks_sharing_a_store(count, **kw):
+    """
+    Helper method that creates one Free-text Response XBlock per
+    student, all backed by the same in-memory KeyValueStore
+    """
+    field_data = KvsFieldData(DictKeyValueStore())
+    xblocks = []
+    for user_id in range(count):
+        runtime = Mock(
+            service=Mock(
+                return_value=Mock(_catalog={}),
+            ),
+        )
+        scope_ids = ScopeIds(
+            user_id,
+            'freetextresponse',
+            'definition-id',
+            'usage-id',
+        )
+        xblock = FreeTextResponse(runtime, field_data, scope_ids)
+        for name, value in kw.items():
+            setattr(xblock, name, value)
+        xblocks.append(xblock)
+    return xblocks
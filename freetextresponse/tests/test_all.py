@@ -5,19 +5,17 @@ import json
 import unittest
 import ddt
 
-from mock import MagicMock, Mock
+from mock import MagicMock
 
-from opaque_keys.edx.locations import SlashSeparatedCourseKey
-
-from xblock.field_data import DictFieldData
 from xblock.validation import ValidationMessage
 from xblockutils.resources import ResourceLoader
 
 from django.db import IntegrityError
 
 from .freetextresponse import Credit
-from .freetextresponse import FreeTextResponse
 
+from .helpers import make_an_xblock
+from .helpers import TestRequest
 from .utils import _
 
 
@@ -30,19 +28,12 @@ class TestData(object):
     max_attempts = 0
     max_word_count = 0
     min_word_count = 0
+    max_other_responses = 3
+    response_pool_size = 10
+    keyphrase_matching = 'exact'
     submitted_message = None
 
 
-class TestRequest(object):
-    # pylint: disable=too-few-public-methods
-    """
-    Module helper for @json_handler
-    """
-    method = None
-    body = None
-    success = None
-
-
 @ddt.ddt
 class FreetextResponseXblockTestCase(unittest.TestCase):
     # pylint: disable=too-many-instance-attributes, too-many-public-methods
@@ -50,30 +41,11 @@ class FreetextResponseXblockTestCase(unittest.TestCase):
     A complete suite of unit tests for the Free-text Response XBlock
     """
 
-    @classmethod
-    def make_an_xblock(cls, **kw):
-        """
-        Helper method that creates a Free-text Response XBlock
-        """
-        course_id = SlashSeparatedCourseKey('foo', 'bar', 'baz')
-        runtime = Mock(
-            course_id=course_id,
-            service=Mock(
-                # Is there a cleaner mock to the `i18n` service?
-                return_value=Mock(_catalog={}),
-            ),
-        )
-        scope_ids = Mock()
-        field_data = DictFieldData(kw)
-        xblock = FreeTextResponse(runtime, field_data, scope_ids)
-        xblock.xmodule_runtime = runtime
-        return xblock
-
     def setUp(self):
         """
         Creates an xblock
         """
-        self.xblock = FreetextResponseXblockTestCase.make_an_xblock()
+        self.xblock = make_an_xblock()
 
     def test_workbench_scenarios(self):
         """
@@ -117,6 +89,13 @@ class FreetextResponseXblockTestCase(unittest.TestCase):
         test_data.max_word_count = test_dict['max_word_count']
         test_data.min_word_count = test_dict['min_word_count']
         test_data.submitted_message = test_dict['submitted_message']
+        test_data.max_other_responses = test_dict.get(
+            'max_other_responses', 3,
+        )
+        test_data.response_pool_size = test_dict.get('response_pool_size', 10)
+        test_data.keyphrase_matching = test_dict.get(
+            'keyphrase_matching', 'exact',
+        )
         validation = set()
         self.xblock.validate_field_data(validation, test_data)
         validation_list = list(validation)
@@ -288,50 +267,6 @@ class FreetextResponseXblockTestCase(unittest.TestCase):
         self.xblock._determine_credit = MagicMock(return_value=Credit.zero)
         self.xblock._compute_score()
 
-    def test_is_at_least_one_phrase_present(self):
-        # pylint: disable=invalid-name, protected-access
-        """
-        Tests _is_at_least_one_phrase_present
-        Helper method to match student response
-        with given phrase list
-        """
-        keyphrases_list = [
-            'do dict phrase',
-            're dict phrase',
-            'mi dict phrase',
-            'fa dict phrase'
-        ]
-        answer = keyphrases_list[1]
-        answer = 'ajhsdfhjaefhaf ' + answer + 'jkfbaufebn;  fuqv'
-        self.assertTrue(
-            FreeTextResponse._is_at_least_one_phrase_present(
-                keyphrases_list,
-                answer,
-            ),
-        )
-
-    def test_not_is_at_least_one_phrase_present(self):
-        # pylint: disable=invalid-name, protected-access
-        """
-        Tests _is_at_least_one_phrase_present
-        Helper method to match student response
-        with given phrase list
-        """
-        keyphrases_list = [
-            'do dict phrase',
-            're dict phrase',
-            'mi dict phrase',
-            'fa dict phrase'
-        ]
-        answer = 'so dict phrase'
-        answer = 'ajhsdfhjaefhaf ' + answer + 'jkfbaufebn;  fuqv'
-        self.assertFalse(
-            FreeTextResponse._is_at_least_one_phrase_present(
-                keyphrases_list,
-                answer,
-            ),
-        )
-
     @ddt.file_data('./tests/word_count_valid.json')
     def test_word_count_valid(self, **test_data):
         # pylint: disable=protected-access
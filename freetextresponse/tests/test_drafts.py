@@ -0,0 +1,219 @@
+"""
+Tests of saving drafts and the student state
+"""
+import json
+import unittest
+
+from mock import Mock, patch
+
+from xblock.runtime import NullI18nService
+
+from freetextresponse.patches import apply_patch
+from freetextresponse.patches import PatchError
+
+from .helpers import make_an_xblock
+from .helpers import TestRequest
+
+
+class DraftsTestCase(unittest.TestCase):
+    """
+    Tests of saving drafts and the student state
+    """
+
+    def setUp(self):
+        """
+        Creates an xblock
+        """
+        self.xblock = make_an_xblock()
+
+    def test_apply_patch(self):
+        """
+        Tests apply_patch
+        Patches splice text in by code point, and are rejected when
+        they do not fit the text
+        """
+        answer_patch = {'start': 6, 'end': 6, 'text': 'brave ', 'length': 17}
+        self.assertEqual(
+            'hello brave world',
+            apply_patch('hello world', answer_patch),
+        )
+        answer_patch = {
+            'start': 1,
+            'end': 2,
+            'text': u'\U0001F601',
+            'length': 3,
+        }
+        self.assertEqual(
+            u'a\U0001F601b',
+            apply_patch(u'a\U0001F600b', answer_patch),
+        )
+        for answer_patch in (
+                {'start': 4, 'end': 12, 'text': '', 'length': 3},
+                {'start': 2, 'end': 1, 'text': '', 'length': 10},
+                {'start': 0, 'end': 0, 'text': 'x', 'length': 10},
+                {'start': -1, 'end': 0, 'text': '', 'length': 11},
+                {'start': True, 'end': 1, 'text': '', 'length': 10},
+                {'start': 0, 'end': 0, 'text': None, 'length': 11},
+                {},
+        ):
+            with self.assertRaises(PatchError):
+                apply_patch('hello world', answer_patch)
+
+    def test_save_reponse_patch(self):
+        """
+        Tests save_reponse with patches
+        Patches against the saved version are applied and counted as
+        a new version; stale or unfitting ones ask for a resync
+        """
+        def save(data):
+            """
+            Post a save and return its JSON response
+            """
+            request = TestRequest()
+            request.method = 'POST'
+            request.body = json.dumps(data).encode('utf-8')
+            # pylint: disable=no-member
+            return self.xblock.save_reponse(request).json_body
+
+        response = save({'student_answer': 'hello world'})
+        self.assertEqual(1, response['student_answer_version'])
+        response = save({
+            'version': 1,
+            'patch': {'start': 6, 'end': 6, 'text': 'brave ', 'length': 17},
+        })
+        self.assertEqual('success', response['status'])
+        self.assertEqual(2, response['student_answer_version'])
+        self.assertEqual('hello brave world', self.xblock.student_answer)
+        response = save({
+            'version': 1,
+            'patch': {'start': 0, 'end': 0, 'text': 'x', 'length': 18},
+        })
+        self.assertEqual(
+            {'status': 'resync', 'student_answer_version': 2},
+            response,
+        )
+        response = save({
+            'version': 2,
+            'patch': {'start': 0, 'end': 99, 'text': '', 'length': 0},
+        })
+        self.assertEqual('resync', response['status'])
+        self.assertEqual('hello brave world', self.xblock.student_answer)
+        response = save({'student_answer': 'hello brave world'})
+        self.assertEqual(2, response['student_answer_version'])
+
+    def test_save_reponse_closed(self):
+        """
+        Tests save_reponse
+        Drafts are not saved once the problem is past due or out of
+        attempts
+        """
+        request = TestRequest()
+        request.method = 'POST'
+        request.body = json.dumps({'student_answer': 'late'}).encode('utf-8')
+        self.xblock.is_past_due = Mock(return_value=True)
+        # pylint: disable=no-member
+        response = self.xblock.save_reponse(request).json_body
+        self.assertEqual('closed', response['status'])
+        self.assertEqual('', self.xblock.student_answer)
+        self.xblock.is_past_due = Mock(return_value=False)
+        self.xblock.max_attempts = 1
+        self.xblock.count_attempts = 1
+        response = self.xblock.save_reponse(request).json_body
+        self.assertEqual('closed', response['status'])
+        self.assertEqual('', self.xblock.student_answer)
+
+    def test_student_state(self):
+        """
+        Tests student_state
+        A fetch returns the state only for an unknown version, and a
+        submit always returns all of it
+        """
+        self.xblock.runtime.service = Mock(return_value=NullI18nService())
+        self.xblock.max_attempts = 2
+        self.xblock.get_student_id = Mock(return_value='student')
+
+        def post(data):
+            """
+            Post to the handler and return its response
+            """
+            request = TestRequest()
+            request.method = 'POST'
+            request.body = json.dumps(data).encode('utf-8')
+            return self.xblock.student_state(request)
+
+        # pylint: disable=no-member
+        response = post({'action': 'fetch'}).json_body
+        self.assertEqual(
+            sorted(self.xblock.get_student_state()),
+            sorted(response['state']),
+        )
+        version = response['state_version']
+        self.assertEqual(
+            {'status': 'success', 'state_version': version, 'state': {}},
+            post({'action': 'fetch', 'state_version': version}).json_body,
+        )
+        response = post({
+            'action': 'save',
+            'state_version': version,
+            'student_answer': 'a draft',
+        }).json_body
+        self.assertEqual({'student_answer_version': 1}, response['state'])
+        self.assertEqual(self.xblock.saved_message, response['user_alert'])
+        response = post({
+            'action': 'submit',
+            'state_version': response['state_version'],
+            'student_answer': 'a draft',
+        }).json_body
+        self.assertEqual(self.xblock.get_student_state(), response['state'])
+        self.assertEqual(
+            'You have used 1 of 2 submissions',
+            response['state']['used_attempts_feedback'],
+        )
+        self.assertEqual(
+            self.xblock.get_state_version(),
+            response['state_version'],
+        )
+        self.assertEqual(1, self.xblock.count_attempts)
+        response = post({'action': 'fetch', 'state_version': 'stale'})
+        response = response.json_body
+        self.assertEqual('a draft', response['student_answer'])
+        response = post({'action': 'delete'})
+        self.assertEqual(400, response.status_code)
+
+    def test_student_state_save(self):
+        """
+        Tests student_state
+        A save computes none of the state, yet returns the version a
+        fetch of the same state would
+        """
+        self.xblock.runtime.service = Mock(return_value=NullI18nService())
+        self.xblock.display_correctness = False
+
+        def post(data):
+            """
+            Post to the handler and return its response
+            """
+            request = TestRequest()
+            request.method = 'POST'
+            request.body = json.dumps(data).encode('utf-8')
+            return self.xblock.student_state(request).json_body
+
+        version = self.xblock.get_state_version()
+        with patch.object(self.xblock, 'get_student_state') as get_state:
+            response = post({
+                'action': 'save',
+                'state_version': version,
+                'student_answer': 'a draft',
+            })
+            self.assertFalse(get_state.called)
+        self.assertEqual({'student_answer_version': 1}, response['state'])
+        self.assertEqual(
+            self.xblock.get_state_version(),
+            response['state_version'],
+        )
+        response = post({
+            'action': 'save',
+            'state_version': 'stale',
+            'student_answer': 'another draft',
+        })
+        self.assertIsNone(response['state_version'])
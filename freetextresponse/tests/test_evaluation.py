@@ -0,0 +1,113 @@
+"""
+Tests of scoring and counting the words of answers
+"""
+import unittest
+import ddt
+
+from freetextresponse.evaluation import Evaluation
+from freetextresponse.evaluation import get_grading_settings
+from freetextresponse.evaluation import Grade
+from freetextresponse.evaluation import grade_batch
+from freetextresponse.wordcount import CHUNK_SIZE
+from freetextresponse.wordcount import count_words
+
+from .freetextresponse import Credit
+
+from .helpers import make_an_xblock
+
+
+@ddt.ddt
+class EvaluationTestCase(unittest.TestCase):
+    """
+    Tests of scoring and counting the words of answers
+    """
+
+    def setUp(self):
+        """
+        Creates an xblock
+        """
+        self.xblock = make_an_xblock()
+
+    def test_evaluation(self):
+        """
+        Tests Evaluation
+        Word count and credit are derived from the answer and settings
+        """
+        evaluation = Evaluation(
+            'a full answer here', 1, 3, ['full answer'], ['half'],
+        )
+        self.assertEqual(4, evaluation.word_count)
+        self.assertFalse(evaluation.word_count_valid)
+        self.assertEqual(Credit.zero, evaluation.credit)
+        self.assertEqual(Credit.full, evaluation.keyphrase_credit)
+        evaluation = Evaluation('a half answer', 1, 3, [], [])
+        self.assertTrue(evaluation.word_count_valid)
+        self.assertEqual(Credit.full, evaluation.credit)
+
+    def test_grade_batch(self):
+        """
+        Tests grade_batch
+        Answers are graded from block settings alone
+        """
+        self.xblock.min_word_count = 2
+        self.xblock.max_word_count = 4
+        self.xblock.fullcredit_keyphrases = ['full']
+        self.xblock.halfcredit_keyphrases = ['half']
+        settings = get_grading_settings(self.xblock)
+        self.assertEqual(
+            [
+                Grade(2, True, Credit.full),
+                Grade(3, True, Credit.half),
+                Grade(1, False, Credit.zero),
+                Grade(5, False, Credit.zero),
+                Grade(2, True, Credit.zero),
+            ],
+            grade_batch(settings, [
+                'full marks',
+                'only half marks',
+                'full',
+                'too many words for full marks',
+                'no marks',
+            ]),
+        )
+
+    def test_get_evaluation_is_memoized(self):
+        # pylint: disable=protected-access
+        """
+        Tests _get_evaluation
+        The answer is only evaluated again once it changes
+        """
+        self.xblock.student_answer = 'first answer'
+        evaluation = self.xblock._get_evaluation()
+        self.xblock._word_count_valid()
+        self.xblock._determine_credit()
+        self.assertIs(evaluation, self.xblock._get_evaluation())
+        self.xblock.student_answer = 'second answer'
+        self.assertIsNot(evaluation, self.xblock._get_evaluation())
+        self.xblock.max_word_count = 1
+        self.assertFalse(self.xblock._word_count_valid())
+
+    @ddt.data(
+        '',
+        '   ',
+        'one',
+        ' one two\tthree\nfour ',
+        'x' * (CHUNK_SIZE + 5),
+        ('ab ' * CHUNK_SIZE) + 'cd',
+        (' w' * CHUNK_SIZE) + '\u3000last',
+    )
+    def test_count_words(self, text):
+        """
+        Tests count_words
+        Counts the same words as str.split, across chunk boundaries
+        """
+        self.assertEqual(len(text.split()), count_words(text))
+
+    def test_count_words_limit(self):
+        """
+        Tests count_words
+        Counting stops once the limit is exceeded
+        """
+        text = 'word ' * (3 * CHUNK_SIZE)
+        self.assertEqual(11, count_words(text, limit=10))
+        self.assertEqual(3 * CHUNK_SIZE, count_words(text, limit=None))
@@ -0,0 +1,91 @@
+"""
+Tests of instrumentation and caching helpers
+"""
+import json
+import unittest
+
+from mock import MagicMock, Mock
+
+from freetextresponse.cache import LRUCache
+from freetextresponse import instrumentation
+
+from .helpers import make_an_xblock
+from .helpers import TestRequest
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    """
+    Tests of instrumentation and caching helpers
+    """
+
+    def setUp(self):
+        """
+        Creates an xblock
+        """
+        self.xblock = make_an_xblock()
+
+    def test_instrumentation_is_off_by_default(self):
+        """
+        Tests instrumentation.timer
+        Without a sink, a shared no-op timer is returned
+        """
+        self.assertIsNone(instrumentation.get_sink())
+        self.assertIs(
+            instrumentation.timer('one'),
+            instrumentation.timer('two'),
+        )
+
+    def test_instrumentation_records_submit(self):
+        """
+        Tests instrumentation
+        A configured sink receives timings and sizes from submit
+        """
+        sink = instrumentation.MemorySink()
+        instrumentation.configure(sink)
+        self.addCleanup(instrumentation.configure, None)
+        self.xblock.runtime.publish = MagicMock(return_value=None)
+        self.xblock.fullcredit_keyphrases = ['four']
+        request = TestRequest()
+        request.method = 'POST'
+        request.body = json.dumps({
+            'student_answer': 'one two three four',
+        }).encode('utf-8')
+        self.xblock.submit(request)
+        for name in ('submit', 'word_count', 'determine_credit'):
+            self.assertEqual(1, len(sink.timings[name]))
+        self.assertEqual(1, len(sink.timings['publish_grade']))
+        self.assertEqual([4], sink.observations['answer_words'])
+        self.assertEqual([1], sink.observations['keyphrases'])
+
+    def test_statsd_sink(self):
+        """
+        Tests instrumentation.StatsdSink
+        Measurements are formatted as statsd lines
+        """
+        sink = instrumentation.StatsdSink(prefix='ftr')
+        sink.send = Mock()
+        sink.timing('submit', 0.0125)
+        sink.incr('grades_coalesced')
+        sink.observe('answer_words', 12)
+        self.assertEqual(
+            [
+                'ftr.submit:12.500|ms',
+                'ftr.grades_coalesced:1|c',
+                'ftr.answer_words:12|h',
+            ],
+            [call[0][0] for call in sink.send.call_args_list],
+        )
+
+    def test_lru_cache(self):
+        """
+        Tests LRUCache
+        The least recently used item is evicted first
+        """
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(2, len(cache))
@@ -0,0 +1,180 @@
+"""
+Tests of matching key phrases
+"""
+import unittest
+import ddt
+
+from mock import patch
+
+from freetextresponse import keyphrases
+from freetextresponse.keyphrases import AUTOMATON_MIN_PHRASES
+from freetextresponse.keyphrases import edit_distance
+from freetextresponse.keyphrases import FuzzyMatcher
+from freetextresponse.keyphrases import get_matcher
+from freetextresponse.keyphrases import KeyphraseMatcher
+
+from .freetextresponse import Credit
+
+
+@ddt.ddt
+class KeyphrasesTestCase(unittest.TestCase):
+    """
+    Tests of matching key phrases
+    """
+
+    @ddt.data(
+        # answer, credit
+        ('nothing to see here', Credit.zero),
+        ('The HALF PHRASE 7 appears', Credit.half),
+        ('a full phrase 2 and a half phrase 2', Credit.full),
+        ('half phrase 1, then full phrase 99', Credit.full),
+        ('overlapping fulfull phrase 5', Credit.full),
+    )
+    @ddt.unpack
+    def test_keyphrase_matcher(self, answer, credit):
+        """
+        Tests KeyphraseMatcher
+        Both the substring scan and the automaton should award
+        the same credit as a plain substring search
+        """
+        fullcredit = ['full phrase {}'.format(i) for i in range(100)]
+        halfcredit = ['half phrase {}'.format(i) for i in range(100)]
+        automaton = KeyphraseMatcher(fullcredit, halfcredit)
+        scanner = KeyphraseMatcher(fullcredit[:3] + [
+            'full phrase 5', 'full phrase 99',
+        ], halfcredit[:8])
+        self.assertTrue(automaton.use_automaton)
+        self.assertFalse(scanner.use_automaton)
+        self.assertEqual(credit, automaton.determine_credit(answer))
+        self.assertEqual(credit, scanner.determine_credit(answer))
+
+    def test_keyphrase_matcher_suffix_phrases(self):
+        """
+        Tests KeyphraseMatcher
+        Phrases that end inside longer phrases must still be found
+        """
+        fullcredit = ['abcd{}'.format(i) for i in range(AUTOMATON_MIN_PHRASES)]
+        matcher = KeyphraseMatcher(fullcredit + ['bc'], ['zzz'])
+        self.assertEqual(Credit.full, matcher.determine_credit('xxabcyy'))
+        self.assertEqual(Credit.zero, matcher.determine_credit('xxacbyy'))
+
+    @ddt.data(
+        ('Photo-synthesis happens here', 'normalized', Credit.full),
+        (u'PHOTOSYNTHESIS, na\xefvely', 'normalized', Credit.full),
+        ('the light   reaction', 'normalized', Credit.half),
+        ('the light reactions', 'normalized', Credit.half),
+        ('concatenate', 'normalized', Credit.half),
+        ('photo-synthesis happens here', 'whole_words', Credit.full),
+        ('the LIGHT\nreaction!', 'whole_words', Credit.half),
+        ('the light reactions', 'whole_words', Credit.zero),
+        ('concatenate', 'whole_words', Credit.zero),
+        ('a cat', 'whole_words', Credit.half),
+        ('photo-synthesis happens here', 'exact', Credit.zero),
+    )
+    @ddt.unpack
+    def test_keyphrase_matching(self, answer, keyphrase_matching, credit):
+        """
+        Tests get_matcher
+        Normalized and whole-word matching ignore case, accents,
+        punctuation and spacing
+        """
+        matcher = get_matcher(
+            ['photosynthesis', 'naive'],
+            ['light reaction', 'cat'],
+            keyphrase_matching,
+        )
+        self.assertEqual(credit, matcher.determine_credit(answer))
+
+    def test_whole_word_matching_multiword_phrases(self):
+        """
+        Tests WholeWordMatcher
+        Phrases sharing a first word are all checked
+        """
+        matcher = get_matcher(
+            ['light reaction cycle'],
+            ['light dependent', 'light reaction'],
+            'whole_words',
+        )
+        self.assertEqual(
+            Credit.half,
+            matcher.determine_credit('light reaction light'),
+        )
+        self.assertEqual(
+            Credit.full,
+            matcher.determine_credit('light dependent light reaction cycle'),
+        )
+
+    @ddt.data(
+        ('Photosynthesis', Credit.full),
+        ('photosynthisis', Credit.full),
+        ('fotosynthesis', Credit.full),
+        ('fotosynthesys', Credit.zero),
+        ('photosynth', Credit.zero),
+        ('the light reactions', Credit.half),
+        ('the ligt reactions', Credit.half),
+        ('the light never reacted', Credit.zero),
+        ('a cat', Credit.half),
+        ('a car', Credit.zero),
+    )
+    @ddt.unpack
+    def test_fuzzy_matcher(self, answer, credit):
+        """
+        Tests FuzzyMatcher
+        Typos and word endings are forgiven in proportion to word length
+        """
+        matcher = FuzzyMatcher(['photosynthesis'], ['light reaction', 'cat'])
+        self.assertEqual(credit, matcher.determine_credit(answer))
+
+    def test_fuzzy_matcher_bounds_work_per_answer(self):
+        """
+        Tests FuzzyMatcher
+        Only a few new words per answer are checked for typos; the rest
+        must match exactly until a later answer checks them
+        """
+        matcher = FuzzyMatcher(['photosynthesis'], ['light reaction'])
+        with patch.object(keyphrases, 'FUZZY_WORDS_PER_ANSWER', 1):
+            self.assertEqual(
+                Credit.half,
+                matcher.determine_credit('about light reaction'),
+            )
+            self.assertEqual(
+                Credit.zero,
+                matcher.determine_credit('below fotosynthesis'),
+            )
+            self.assertEqual(
+                Credit.full,
+                matcher.determine_credit('below fotosynthesis'),
+            )
+
+    @ddt.data(
+        ('kitten', 'sitting', 3, 3),
+        ('kitten', 'sitting', 1, 2),
+        ('flaw', 'lawn', 2, 2),
+        ('same', 'same', 0, 0),
+        ('short', 'much longer', 2, 3),
+    )
+    @ddt.unpack
+    def test_edit_distance(self, first, second, limit, distance):
+        """
+        Tests edit_distance
+        Distances beyond the limit are reported as limit + 1
+        """
+        self.assertEqual(distance, edit_distance(first, second, limit))
+
+    def test_get_matcher_is_cached(self):
+        """
+        Tests get_matcher
+        Blocks with the same key phrases share one compiled matcher
+        """
+        matcher = get_matcher(['full one'], ['half one'])
+        self.assertIs(matcher, get_matcher(['full one'], ['half one']))
+        self.assertIsNot(matcher, get_matcher(['full one'], ['half two']))
+
+    def test_get_matcher_unknown_matching(self):
+        """
+        Tests get_matcher
+        An unknown matching falls back to exact matching
+        """
+        matcher = get_matcher(['Full One'], [], 'phonetic')
+        self.assertIs(KeyphraseMatcher, type(matcher))
+        self.assertEqual(Credit.full, matcher.determine_credit('full one'))
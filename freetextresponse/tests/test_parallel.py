@@ -0,0 +1,154 @@
+"""
+Tests of scoring on a pool of worker processes
+"""
+import multiprocessing
+from multiprocessing.dummy import Pool as ThreadPool
+import unittest
+import ddt
+
+from mock import Mock, call, patch
+
+from django.test import override_settings
+
+from freetextresponse import parallel
+
+from .freetextresponse import Credit
+
+
+@ddt.ddt
+class ParallelTestCase(unittest.TestCase):
+    """
+    Tests of scoring on a pool of worker processes
+    """
+
+    @ddt.data(
+        ('x' * 30 + 'full credit phrase', Credit.full),
+        ('x' * 37 + 'half credit' + 'x' * 10, Credit.half),
+        ('x' * 60, Credit.zero),
+    )
+    @ddt.unpack
+    def test_determine_credit_in_parallel(self, answer, credit):
+        """
+        Tests determine_credit_in_parallel
+        Phrases that straddle segment boundaries are still found
+        """
+        pool = ThreadPool(2)
+        try:
+            for segment_count in range(1, 7):
+                self.assertEqual(
+                    credit,
+                    parallel.determine_credit_in_parallel(
+                        ['Full Credit Phrase'],
+                        ['half credit'],
+                        answer,
+                        pool,
+                        segment_count,
+                    ),
+                )
+        finally:
+            pool.close()
+
+    def test_determine_credit_in_parallel_times_out(self):
+        """
+        Tests determine_credit_in_parallel
+        Answers are scored inline once a worker takes too long
+        """
+        pool = Mock()
+        pool.imap_unordered.return_value.next.side_effect = (
+            multiprocessing.TimeoutError
+        )
+        self.assertEqual(
+            Credit.full,
+            parallel.determine_credit_in_parallel(
+                ['full credit'],
+                [],
+                'x' * 50 + 'full credit',
+                pool,
+                2,
+                timeout=0.1,
+            ),
+        )
+        self.assertEqual(1, pool.imap_unordered.return_value.next.call_count)
+
+    def test_determine_credit_in_parallel_has_one_deadline(self):
+        # pylint: disable=invalid-name
+        """
+        Tests determine_credit_in_parallel
+        The timeout bounds the wait for all the segments, not each one
+        """
+        pool = Mock()
+        pool.imap_unordered.return_value.next.side_effect = [
+            Credit.zero,
+            Credit.zero,
+            multiprocessing.TimeoutError,
+        ]
+        clock = Mock(time=Mock(side_effect=[100.0, 100.0, 104.0, 106.0]))
+        with patch.object(parallel, 'time', clock):
+            self.assertEqual(
+                Credit.full,
+                parallel.determine_credit_in_parallel(
+                    ['full credit'],
+                    [],
+                    'x' * 50 + 'full credit',
+                    pool,
+                    3,
+                    timeout=5,
+                ),
+            )
+        self.assertEqual(
+            [call(5.0), call(1.0), call(0)],
+            pool.imap_unordered.return_value.next.call_args_list,
+        )
+
+    def test_start_worker_pool(self):
+        """
+        Tests start_worker_pool and get_worker_pool
+        The pool is only started when parallel scoring is on, and only
+        by start_worker_pool
+        """
+        with patch.object(parallel.multiprocessing, 'Pool') as mock, \
+                patch.dict(parallel._POOLS, clear=True):
+            parallel.start_worker_pool()
+            self.assertFalse(mock.called)
+            with override_settings(FREETEXTRESPONSE_SCORING_WORKERS=3):
+                self.assertIsNone(parallel.get_worker_pool())
+                parallel.start_worker_pool()
+                parallel.start_worker_pool()
+                self.assertIs(mock.return_value, parallel.get_worker_pool())
+            mock.assert_called_once_with(3)
+
+    def test_determine_credit_uses_pool_for_large_answers(self):
+        """
+        Tests determine_credit
+        Only large answers are scored on the pool, and only when enabled
+        """
+        with patch.object(parallel, 'determine_credit_in_parallel') as mock:
+            mock.return_value = Credit.half
+            self.assertEqual(
+                Credit.full,
+                parallel.determine_credit(['full'], [], 'full marks'),
+            )
+            with override_settings(
+                FREETEXTRESPONSE_SCORING_WORKERS=2,
+                FREETEXTRESPONSE_PARALLEL_SCORING_MIN_CHARACTERS=20,
+            ):
+                with patch.object(parallel, 'get_worker_pool'):
+                    self.assertEqual(
+                        Credit.full,
+                        parallel.determine_credit(['full'], [], 'full marks'),
+                    )
+                    self.assertEqual(
+                        Credit.half,
+                        parallel.determine_credit(['full'], [], 'x' * 20),
+                    )
+                # Without a pool started with the app, nothing is forked
+                with patch.object(
+                        parallel,
+                        'get_worker_pool',
+                        return_value=None,
+                ):
+                    self.assertEqual(
+                        Credit.zero,
+                        parallel.determine_credit(['full'], [], 'x' * 20),
+                    )
+            self.assertEqual(1, mock.call_count)
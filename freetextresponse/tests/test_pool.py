@@ -0,0 +1,281 @@
+"""
+Tests of the pool of responses shown to other students
+"""
+import json
+import threading
+import unittest
+
+from mock import Mock, patch
+
+from django.test import override_settings
+
+from freetextresponse.fields import compress_text
+from freetextresponse.fields import CompressedText
+from freetextresponse.fields import decompress_text
+from freetextresponse.pool import Response
+from freetextresponse.pool import ResponsePool
+from freetextresponse import summary
+from freetextresponse.summary import update_summary_field
+
+from .freetextresponse import Credit
+from .freetextresponse import FreeTextResponse
+
+from .helpers import make_an_xblock
+from .helpers import make_xblocks_sharing_a_store
+from .helpers import TestRequest
+
+
+class ResponsePoolTestCase(unittest.TestCase):
+    """
+    Tests of the pool of responses shown to other students
+    """
+
+    def setUp(self):
+        """
+        Creates an xblock
+        """
+        self.xblock = make_an_xblock()
+
+    def test_response_pool(self):
+        """
+        Tests ResponsePool
+        The pool keeps the lowest-priority students, one slot each
+        """
+        pool = ResponsePool(5, salt='block')
+        student_ids = [str(index) for index in range(200)]
+        for student_id in student_ids:
+            pool.add(student_id, 'answer ' + student_id)
+        expected = sorted(student_ids, key=pool.priority)[:5]
+        self.assertEqual(5, len(pool))
+        self.assertEqual(
+            sorted(expected),
+            sorted(entry['student_id'] for entry in pool.to_list()),
+        )
+        self.assertTrue(pool.add(expected[0], 'new answer'))
+        self.assertIn(
+            {'student_id': expected[0], 'answer': 'new answer'},
+            pool.to_list(),
+        )
+        restored = ResponsePool(2, pool.to_list(), salt='block')
+        self.assertEqual(
+            sorted(expected[:2]),
+            sorted(entry['student_id'] for entry in restored.to_list()),
+        )
+
+    def test_response_record(self):
+        """
+        Tests Response
+        Records round-trip through the stored dict form, sharing ids
+        """
+        entry = {'student_id': ''.join(['student', '-1']), 'answer': 'a'}
+        record = Response.from_dict(entry)
+        self.assertEqual(entry, record.to_dict())
+        self.assertEqual(record, Response('student-1', 'a'))
+        self.assertNotEqual(record, Response('student-1', 'b'))
+        self.assertIs(
+            record.student_id,
+            Response.from_dict(dict(entry)).student_id,
+        )
+        with self.assertRaises(AttributeError):
+            record.score = 1.0
+
+    @override_settings(FREETEXTRESPONSE_COMPRESS_ANSWERS_ABOVE=100)
+    def test_compressed_answers(self):
+        """
+        Tests CompressedString and compressed pool entries
+        Long answers are stored compressed and read back as text;
+        pooled ones stay compressed until they are shown
+        """
+        short_answer = u'caf\xe9 ' * 10
+        long_answer = u'caf\xe9 ' * 100
+        self.assertEqual(short_answer, compress_text(short_answer, 100))
+        self.assertEqual(long_answer, compress_text(long_answer))
+        stored = compress_text(long_answer, 100)
+        self.assertLess(len(json.dumps(stored)), len(long_answer))
+        self.assertEqual(long_answer, decompress_text(stored))
+        first, second = make_xblocks_sharing_a_store(
+            2,
+            score=1.0,
+            display_other_student_responses=True,
+        )
+        first.student_answer = long_answer
+        first.save()
+        first.store_student_response()
+        field = first.fields['student_answer']
+        field_data = first._field_data  # pylint: disable=protected-access
+        self.assertEqual(stored, field_data.get(first, field.name))
+        self.assertEqual(long_answer, field.read_from(first))
+        stored_entry = second.displayable_answers[0]
+        self.assertEqual(stored, stored_entry['answer'])
+        pool = second.get_response_pool()
+        self.assertIsInstance(pool.to_list()[0]['answer'], dict)
+        self.assertEqual(
+            CompressedText(stored['zlib']),
+            Response.from_dict(stored_entry).answer,
+        )
+        self.assertEqual(
+            [long_answer],
+            [entry['answer'] for entry in pool.sample(1, seed='1')],
+        )
+
+    def test_response_pool_sample(self):
+        """
+        Tests ResponsePool.sample
+        Draws are deterministic per seed and leave out the student
+        """
+        pool = ResponsePool(10)
+        for index in range(10):
+            pool.add(str(index), 'answer')
+        sample = pool.sample(3, seed='4', exclude='4')
+        self.assertEqual(3, len(sample))
+        self.assertNotIn('4', [entry['student_id'] for entry in sample])
+        self.assertEqual(sample, pool.sample(3, seed='4', exclude='4'))
+        self.assertEqual([], pool.sample(0, seed='4'))
+        self.assertEqual(10, len(pool.sample(20, seed='4')))
+
+    def test_store_student_response(self):
+        """
+        Tests store_student_response
+        Full-credit answers are pooled and shown to other students
+        """
+        self.xblock.display_other_student_responses = True
+        self.xblock.response_pool_size = 4
+        self.xblock.max_other_responses = 2
+        self.xblock.score = 1.0
+        for index in range(30):
+            student_id = str(index)
+            self.xblock.get_student_id = Mock(return_value=student_id)
+            self.xblock.student_answer = 'answer ' + student_id
+            self.xblock.store_student_response()
+        self.assertEqual(4, len(self.xblock.displayable_answers))
+        other_answers = self.xblock.get_other_answers()
+        self.assertEqual(2, len(other_answers))
+        self.assertNotIn(
+            '29',
+            [entry['student_id'] for entry in other_answers],
+        )
+        self.assertEqual(other_answers, self.xblock.get_other_answers())
+
+    def test_concurrent_store_student_response(self):
+        # pylint: disable=invalid-name
+        """
+        Tests store_student_response
+        Simulates many students submitting at once, from many threads:
+        every block loads the pool before any of them writes it, yet no
+        full-credit response that belongs in the pool is lost
+        """
+        xblocks = make_xblocks_sharing_a_store(
+            40,
+            display_other_student_responses=True,
+            response_pool_size=8,
+        )
+        for xblock in xblocks:
+            self.assertEqual([], xblock.displayable_answers)
+        start = threading.Event()
+
+        def submit(xblock):
+            """
+            Submit a full-credit answer once every thread is ready
+            """
+            request = TestRequest()
+            request.method = 'POST'
+            request.body = json.dumps({
+                'student_answer': 'answer',
+                'can_record_response': True,
+            }).encode('utf-8')
+            start.wait()
+            xblock.submit(request)
+        threads = [
+            threading.Thread(target=submit, args=(xblock,))
+            for xblock in xblocks
+        ]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        expected = ResponsePool(8, salt='usage-id')
+        for xblock in xblocks:
+            expected.add(xblock.get_student_id(), 'answer')
+        stored = FreeTextResponse(
+            xblocks[0].runtime,
+            xblocks[0]._field_data,  # pylint: disable=protected-access
+            xblocks[0].scope_ids,
+        )
+        self.assertEqual(
+            sorted(entry['student_id'] for entry in expected.to_list()),
+            sorted(
+                entry['student_id']
+                for entry in stored.displayable_answers
+            ),
+        )
+
+    def test_store_student_response_keeps_own_copy_clean(self):
+        # pylint: disable=invalid-name
+        """
+        Tests store_student_response
+        The block sees the pool it stored, and saving the block later
+        does not write that copy back over newer submissions
+        """
+        first, second = make_xblocks_sharing_a_store(
+            2,
+            display_other_student_responses=True,
+            score=Credit.full.value,
+            student_answer='answer',
+        )
+        self.assertEqual([], first.displayable_answers)
+        first.store_student_response()
+        self.assertEqual(
+            [first.get_student_id()],
+            [entry['student_id'] for entry in first.displayable_answers],
+        )
+        second.store_student_response()
+        first.save()
+        stored = FreeTextResponse(
+            first.runtime,
+            first._field_data,  # pylint: disable=protected-access
+            first.scope_ids,
+        )
+        self.assertEqual(2, len(stored.displayable_answers))
+
+    def test_update_summary_field_without_field_data(self):
+        # pylint: disable=invalid-name
+        """
+        Tests update_summary_field
+        Blocks whose field data cannot be reached get a plain field write
+        """
+        with patch(
+                'freetextresponse.summary._get_field_data',
+                return_value=None,
+        ):
+            result = update_summary_field(
+                self.xblock,
+                'displayable_answers',
+                lambda entries: entries + [{'student_id': 'id'}],
+            )
+        self.assertEqual([{'student_id': 'id'}], result)
+        self.assertEqual(result, self.xblock.displayable_answers)
+
+    def test_update_summary_field_gives_up(self):
+        """
+        Tests update_summary_field
+        A value that keeps changing underneath is not written, and the
+        failure is reported
+        """
+        store = Mock(
+            read=Mock(return_value=([], [])),
+            compare_and_set=Mock(return_value=False),
+        )
+        with patch('freetextresponse.summary.LOG') as log:
+            result = update_summary_field(
+                self.xblock,
+                'displayable_answers',
+                lambda entries: entries + [{'student_id': 'id'}],
+                store,
+            )
+        self.assertIsNone(result)
+        self.assertEqual(
+            summary.MAX_UPDATE_ATTEMPTS,
+            store.compare_and_set.call_count,
+        )
+        self.assertTrue(log.error.called)
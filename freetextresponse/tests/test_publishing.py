@@ -0,0 +1,113 @@
+"""
+Tests of publishing grades
+"""
+import threading
+import unittest
+
+from mock import MagicMock, patch
+
+from freetextresponse.publishing import DeferredGradePublisher
+from freetextresponse.publishing import GradePublisher
+
+from .helpers import make_an_xblock
+from .helpers import make_xblocks_sharing_a_store
+
+
+class PublishingTestCase(unittest.TestCase):
+    """
+    Tests of publishing grades
+    """
+
+    def setUp(self):
+        """
+        Creates an xblock
+        """
+        self.xblock = make_an_xblock()
+
+    def test_grade_publisher(self):
+        """
+        Tests GradePublisher
+        Grades are handed straight to the block's runtime
+        """
+        self.xblock.runtime.publish = MagicMock(return_value=None)
+        grade = {'value': 1.0, 'max_value': 1.0}
+        GradePublisher().publish(self.xblock, grade)
+        self.xblock.runtime.publish.assert_called_once_with(
+            self.xblock,
+            'grade',
+            grade,
+        )
+
+    def test_deferred_grade_publisher(self):
+        """
+        Tests DeferredGradePublisher
+        Scores are stored once flushed, without the block, and only the
+        latest score per learner and block is stored
+        """
+        store = MagicMock(return_value=None)
+        publisher = DeferredGradePublisher(delay=60, store=store)
+        xblock, other_xblock = make_xblocks_sharing_a_store(2)
+        for runtime in (xblock.runtime, other_xblock.runtime):
+            runtime.publish = MagicMock(return_value=None)
+        publisher.publish(xblock, {'value': 0.0, 'max_value': 1.0})
+        publisher.publish(other_xblock, {'value': 0.5, 'max_value': 1.0})
+        publisher.publish(xblock, {'value': 1.0, 'max_value': 1.0})
+        store.assert_not_called()
+        publisher.flush()
+        xblock.runtime.publish.assert_not_called()
+        self.assertEqual(
+            [
+                (1, 0.5, 1.0, other_xblock.weight),
+                (0, 1.0, 1.0, xblock.weight),
+            ],
+            [
+                (
+                    score['user_id'],
+                    score['raw_earned'],
+                    score['raw_possible'],
+                    score['weight'],
+                )
+                for (score,), _kwargs in store.call_args_list
+            ],
+        )
+        self.assertEqual('usage-id', store.call_args[0][0]['usage_id'])
+
+    def test_deferred_grade_publisher_flushes_on_timer(self):
+        # pylint: disable=invalid-name
+        """
+        Tests DeferredGradePublisher
+        Queued scores are stored by a timer, outside any request, and a
+        score that fails does not stop the others
+        """
+        stored = threading.Event()
+
+        def store_score(score):
+            """
+            Fail on the first score, and note the second
+            """
+            if score['user_id'] == 0:
+                raise ValueError
+            stored.set()
+        publisher = DeferredGradePublisher(delay=0.01, store=store_score)
+        xblock, other_xblock = make_xblocks_sharing_a_store(2)
+        with patch('freetextresponse.publishing.LOG') as log:
+            publisher.publish(xblock, {'value': 1.0, 'max_value': 1.0})
+            publisher.publish(other_xblock, {'value': 0.5, 'max_value': 1.0})
+            self.assertTrue(stored.wait(5))
+        self.assertTrue(log.exception.called)
+
+    def test_deferred_grade_publisher_without_store(self):
+        # pylint: disable=invalid-name
+        """
+        Tests DeferredGradePublisher
+        Without anywhere to store scores, such as outside edx-platform,
+        grades are published synchronously
+        """
+        self.xblock.runtime.publish = MagicMock(return_value=None)
+        publisher = DeferredGradePublisher(delay=60)
+        publisher.publish(self.xblock, {'value': 1.0, 'max_value': 1.0})
+        self.xblock.runtime.publish.assert_called_once_with(
+            self.xblock,
+            'grade',
+            {'value': 1.0, 'max_value': 1.0},
+        )
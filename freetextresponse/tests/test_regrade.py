@@ -0,0 +1,188 @@
+"""
+Tests of regrading and exporting stored answers
+"""
+import io
+import json
+import unittest
+
+from mock import Mock
+
+from xblock.runtime import NullI18nService
+
+from freetextresponse.export import iter_export_lines
+from freetextresponse.fields import compress_text
+from freetextresponse.export import iter_records
+from freetextresponse.export import write_lines
+from freetextresponse.regrade import iter_batches
+from freetextresponse.regrade import regrade_states
+
+from .helpers import make_an_xblock
+from .helpers import TestRequest
+
+
+class RegradeTestCase(unittest.TestCase):
+    """
+    Tests of regrading and exporting stored answers
+    """
+
+    def setUp(self):
+        """
+        Creates an xblock
+        """
+        self.xblock = make_an_xblock()
+
+    def test_iter_batches(self):
+        """
+        Tests iter_batches
+        Items are grouped into lists of at most batch_size
+        """
+        self.assertEqual(
+            [[0, 1], [2, 3], [4]],
+            list(iter_batches(iter(range(5)), 2)),
+        )
+
+    def test_regrade_states(self):
+        """
+        Tests regrade_states
+        Only submitted states whose score changes under the new key
+        phrases are reported, with the new score written into the
+        state; the submitted answer is scored, not a later draft
+        """
+        self.xblock.fullcredit_keyphrases = ['new phrase']
+        self.xblock.halfcredit_keyphrases = ['old phrase']
+
+        def stored(student_answer, score, count_attempts=1, **kw):
+            """
+            Build a stored state
+            """
+            return dict(
+                kw,
+                student_answer=student_answer,
+                score=score,
+                count_attempts=count_attempts,
+            )
+        states = [
+            ('a', stored('the old phrase', 1.0)),
+            ('b', stored('the new phrase', 1.0)),
+            ('c', stored('nothing', 0.0)),
+            ('d', stored('the new phrase', 0.0)),
+            ('e', {}),
+            ('f', stored('the new phrase', 0.0, count_attempts=0)),
+            ('g', stored(
+                'the old phrase draft',
+                1.0,
+                student_answer_version=3,
+                submitted_answer_version=2,
+            )),
+            ('h', stored(
+                compress_text('the new phrase', 0),
+                0.0,
+                student_answer_version=2,
+                submitted_answer_version=2,
+            )),
+        ]
+        batches = list(regrade_states(self.xblock, iter(states), 2))
+        self.assertEqual(
+            [2, 2, 2, 2],
+            [read for read, _changed in batches],
+        )
+        changed = [
+            (key, state['score'])
+            for _read, batch in batches
+            for key, state in batch
+        ]
+        self.assertEqual(
+            [('a', 0.5), ('d', 1.0), ('h', 1.0)],
+            changed,
+        )
+
+    def test_submit_keeps_submitted_answer_version(self):
+        """
+        Tests submit and save_reponse
+        The submitted answer's version is kept apart from drafts saved
+        after it
+        """
+        self.xblock.runtime.service = Mock(return_value=NullI18nService())
+        self.assertIsNone(self.xblock.submitted_answer_version)
+        for handler, answer in (
+                (self.xblock.submit, 'submitted'),
+                (self.xblock.save_reponse, 'a draft'),
+        ):
+            request = TestRequest()
+            request.method = 'POST'
+            request.body = json.dumps({
+                'student_answer': answer,
+            }).encode('utf-8')
+            handler(request)
+        self.assertEqual('a draft', self.xblock.student_answer)
+        self.assertEqual(1, self.xblock.submitted_answer_version)
+        self.assertEqual(2, self.xblock.student_answer_version)
+
+    def test_export(self):
+        """
+        Tests iter_records, iter_export_lines and write_lines
+        Records are written one line at a time, with missing fields
+        exported as their defaults
+        """
+        rows = [
+            (1, 'ann', {
+                'student_answer': u'caf\xe9, "quoted"',
+                'score': 1.0,
+                'count_attempts': 2,
+            }),
+            (2, 'bob', {}),
+        ]
+        csv_lines = list(iter_export_lines(iter_records(rows), 'csv'))
+        self.assertEqual(
+            [
+                'user_id,username,student_answer,score,count_attempts\r\n',
+                u'1,ann,"caf\xe9, ""quoted""",1.0,2\r\n',
+                '2,bob,,0.0,0\r\n',
+            ],
+            csv_lines,
+        )
+        jsonl_lines = list(iter_export_lines(iter_records(rows), 'jsonl'))
+        self.assertEqual(
+            {
+                'user_id': 2,
+                'username': 'bob',
+                'student_answer': '',
+                'score': 0.0,
+                'count_attempts': 0,
+            },
+            json.loads(jsonl_lines[1]),
+        )
+        output = io.BytesIO()
+        self.assertEqual(2, write_lines(jsonl_lines, output))
+        self.assertEqual(
+            ''.join(jsonl_lines).encode('utf-8'),
+            output.getvalue(),
+        )
+        with self.assertRaises(ValueError):
+            iter_export_lines(iter_records(rows), 'xml')
+
+    def test_export_csv_formulas(self):
+        """
+        Tests iter_export_lines
+        CSV cells a spreadsheet would run as formulas are quoted, while
+        JSON Lines keep the answer as it is
+        """
+        rows = [
+            (1, '@ann', {'student_answer': '=HYPERLINK("x")'}),
+            (2, 'bob', {'student_answer': '+1'}),
+            (3, 'cy', {'student_answer': '-1', 'score': 0.5}),
+        ]
+        csv_lines = list(iter_export_lines(iter_records(rows), 'csv'))
+        self.assertEqual(
+            [
+                '1,\'@ann,"\'=HYPERLINK(""x"")",0.0,0\r\n',
+                "2,bob,'+1,0.0,0\r\n",
+                "3,cy,'-1,0.5,0\r\n",
+            ],
+            csv_lines[1:],
+        )
+        jsonl_lines = list(iter_export_lines(iter_records(rows), 'jsonl'))
+        self.assertEqual(
+            '=HYPERLINK("x")',
+            json.loads(jsonl_lines[0])['student_answer'],
+        )
@@ -0,0 +1,258 @@
+"""
+Tests of rendering the student view
+"""
+import json
+import unittest
+
+from mock import Mock
+
+from xblock.runtime import NullI18nService
+
+from django.template import Context
+from django.utils import translation
+
+from freetextresponse.mixins.fragment import get_localized_template
+from freetextresponse.pool import ResponsePool
+
+from .freetextresponse import Credit
+
+from .helpers import make_an_xblock
+from .helpers import make_xblocks_sharing_a_store
+from .helpers import TestRequest
+
+
+class RenderingTestCase(unittest.TestCase):
+    """
+    Tests of rendering the student view
+    """
+
+    def setUp(self):
+        """
+        Creates an xblock
+        """
+        self.xblock = make_an_xblock()
+
+    def test_localized_template_escapes_translations(self):
+        # pylint: disable=invalid-name
+        """
+        Tests get_localized_template
+        Translations pasted into the template are escaped, so they can
+        neither add markup nor be rendered as template syntax
+        """
+        loader = Mock(
+            module_name='escaped-translations',
+            load_unicode=Mock(
+                return_value='{% load i18n %}<p>{% trans "Submit" %}</p>',
+            ),
+        )
+        service = Mock(
+            _catalog={'Submit': '<b>{{ answer }}{% now "Y" %}&'},
+            _fallback=None,
+            _info={},
+            plural=lambda count: int(count != 1),
+        )
+        with translation.override('en'):
+            template = get_localized_template(loader, 'view.html', service)
+            rendered = template.render(Context({'answer': 'injected'}))
+        self.assertEqual(
+            '<p>&lt;b&gt;&#123;&#123; answer &#125;&#125;'
+            '&#123;% now &quot;Y&quot; %&#125;&amp;</p>',
+            rendered,
+        )
+
+    def test_render_template(self):
+        """
+        Tests render_template
+        The cached template renders the context and translated strings
+        """
+        self.xblock.runtime.service = Mock(return_value=NullI18nService())
+        context = self.xblock.provide_context()
+        rendered = self.xblock.render_template('templates/view.html', context)
+        self.assertIn(self.xblock.display_name, rendered)
+        self.assertIn('Submit', rendered)
+
+    def test_provide_context_is_lazy(self):
+        # pylint: disable=protected-access
+        """
+        Tests provide_context
+        Other responses are only looked up, and the answer only scored
+        for them, when the template shows them
+        """
+        self.xblock.runtime.service = Mock(return_value=NullI18nService())
+        self.xblock.student_answer = 'a finished answer'
+        self.xblock.display_correctness = False
+        self.xblock.get_student_id = Mock(return_value='student')
+        self.xblock._determine_credit = Mock(return_value=Credit.full)
+        self.xblock.get_response_pool = Mock(
+            return_value=ResponsePool(5, [
+                {'student_id': 'other', 'answer': 'another answer'},
+            ]),
+        )
+        context = self.xblock.provide_context()
+        rendered = self.xblock.render_template('templates/view.html', context)
+        self.assertIn('a finished answer', rendered)
+        self.assertFalse(self.xblock._determine_credit.called)
+        self.assertFalse(self.xblock.get_response_pool.called)
+        self.xblock.display_other_student_responses = True
+        context = self.xblock.provide_context()
+        rendered = self.xblock.render_template('templates/view.html', context)
+        self.assertIn('another answer', rendered)
+        self.assertEqual(1, self.xblock.get_response_pool.call_count)
+
+    def test_localized_template_is_shared(self):
+        """
+        Tests get_localized_template
+        Blocks rendering a template in one language share its compiled
+        form
+        """
+        template = get_localized_template(
+            self.xblock.loader,
+            'templates/view.html',
+            NullI18nService(),
+        )
+        self.assertIs(
+            template,
+            get_localized_template(
+                self.xblock.loader,
+                'templates/view.html',
+                NullI18nService(),
+            ),
+        )
+
+    def test_student_view_autosave(self):
+        """
+        Tests student_view
+        The view only asks its script to autosave when the author
+        turned autosave on
+        """
+        self.xblock.runtime.service = Mock(return_value=NullI18nService())
+        self.xblock.runtime.local_resource_url = Mock(return_value='/url')
+        self.assertNotIn('data-autosave', self.xblock.student_view().content)
+        self.xblock.autosave = True
+        self.assertIn(
+            'data-autosave="true"',
+            self.xblock.student_view().content,
+        )
+
+    def test_student_view_is_cached_once_finished(self):
+        """
+        Tests student_view
+        Finished problems are rendered again only once the learner's
+        state changes
+        """
+        self.xblock.runtime.service = Mock(return_value=NullI18nService())
+        self.xblock.runtime.local_resource_url = Mock(return_value='/url')
+        self.xblock.max_attempts = 1
+        self.xblock.provide_context = Mock(
+            wraps=self.xblock.provide_context,
+        )
+        self.assertIsNone(self.xblock.get_fragment_cache_key())
+        self.xblock.student_view()
+        self.xblock.student_view()
+        self.assertEqual(2, self.xblock.provide_context.call_count)
+        self.xblock.count_attempts = 1
+        self.xblock.student_answer = 'a finished answer'
+        fragment = self.xblock.student_view()
+        cached_fragment = self.xblock.student_view()
+        self.assertEqual(3, self.xblock.provide_context.call_count)
+        self.assertEqual(fragment.content, cached_fragment.content)
+        self.assertEqual(fragment.resources, cached_fragment.resources)
+        self.xblock.score = 1.0
+        self.xblock.student_view()
+        self.assertEqual(4, self.xblock.provide_context.call_count)
+        key = self.xblock.get_fragment_cache_key()
+        self.xblock.prompt = 'a long prompt ' * 1000
+        self.xblock.displayable_answers = [{
+            'student_id': 'other',
+            'answer': 'a long answer ' * 1000,
+        }]
+        long_key = self.xblock.get_fragment_cache_key()
+        self.assertNotEqual(key, long_key)
+        self.assertEqual(len(repr(key)), len(repr(long_key)))
+
+    def test_settings_values_are_shared(self):
+        # pylint: disable=protected-access
+        """
+        Tests derived_from_settings
+        Values derived from settings are computed once for all learners,
+        and again once Studio saves new settings
+        """
+        xblock, other_xblock = make_xblocks_sharing_a_store(2)
+        for block in (xblock, other_xblock):
+            block.runtime.service = Mock(return_value=NullI18nService())
+        message = xblock._get_word_count_message()
+        other_xblock.ungettext = Mock()
+        self.assertEqual(message, other_xblock._get_word_count_message())
+        other_xblock.ungettext.assert_not_called()
+        self.assertIs(
+            xblock.get_settings_values(),
+            other_xblock.get_settings_values(),
+        )
+        request = TestRequest()
+        request.method = 'POST'
+        request.body = json.dumps({
+            'values': {'max_word_count': 20},
+            'defaults': [],
+        }).encode('utf-8')
+        xblock.submit_studio_edits(request)
+        self.assertIn('and 20 words', xblock._get_word_count_message())
+        self.assertIsNot(
+            xblock.get_settings_values(),
+            other_xblock.get_settings_values(),
+        )
+
+    def test_get_resource_url_is_cached(self):
+        """
+        Tests get_resource_url
+        Asset URLs are resolved once per runtime
+        """
+        xblock, other_xblock = make_xblocks_sharing_a_store(2)
+        xblock.runtime.local_resource_url = Mock(return_value='/url')
+        other_xblock.runtime = xblock.runtime
+        self.assertEqual('/url', xblock.get_resource_url('public/a'))
+        self.assertEqual('/url', other_xblock.get_resource_url('public/a'))
+        xblock.runtime.local_resource_url.assert_called_once_with(
+            xblock,
+            'public/a',
+        )
+
+    def test_i18n_service_is_resolved_once(self):
+        # pylint: disable=protected-access
+        """
+        Tests _i18n_service
+        The runtime service is looked up once per block
+        """
+        service = self.xblock._i18n_service()
+        self.xblock._i18n_service()
+        self.assertIs(service, self.xblock._i18n_service())
+        self.assertEqual(1, self.xblock.runtime.service.call_count)
+
+    def test_translations_are_cached_per_locale(self):
+        """
+        Tests ugettext and ungettext
+        Translations are cached by service, locale and message
+        """
+        service = Mock(
+            ugettext=Mock(side_effect=lambda text: text.upper()),
+            ungettext=Mock(side_effect=lambda one, many, count: many),
+        )
+        self.xblock.runtime.service = Mock(return_value=service)
+        other_xblock = make_an_xblock()
+        other_xblock.runtime.service = Mock(return_value=service)
+        with translation.override('en'):
+            self.assertEqual('CACHED', self.xblock.ugettext('cached'))
+            self.assertEqual('CACHED', other_xblock.ugettext('cached'))
+            self.assertEqual(
+                'many cached',
+                self.xblock.ungettext('one cached', 'many cached', 2),
+            )
+            self.xblock.ungettext('one cached', 'many cached', 2)
+        with translation.override('fr'):
+            self.xblock.ugettext('cached')
+        self.assertEqual(2, service.ugettext.call_count)
+        self.assertEqual(1, service.ungettext.call_count)
+        other_service = Mock(ugettext=Mock(return_value='autre'))
+        third_xblock = make_an_xblock()
+        third_xblock.runtime.service = Mock(return_value=other_service)
+        with translation.override('en'):
+            self.assertEqual('autre', third_xblock.ugettext('cached'))
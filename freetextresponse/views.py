@@ -5,15 +5,35 @@ from __future__ import absolute_import
 
 from six import text_type
 from xblock.core import XBlock
+from xblock.exceptions import JsonHandlerError
 from xblock.validation import ValidationMessage
 from xblockutils.resources import ResourceLoader
 from xblockutils.studio_editable import StudioEditableXBlockMixin
 
+from .evaluation import Evaluation
+from .evaluation import evaluation_key
+from .instrumentation import incr
+from .instrumentation import timed
 from .mixins.dates import EnforceDueDates
+from .mixins.fragment import LazyValue
 from .mixins.fragment import XBlockFragmentBuilderMixin
 from .mixins.i18n import I18nXBlockMixin
 from .models import Credit
-from .models import MAX_RESPONSES
+from .models import derived_from_settings
+from .models import KeyphraseMatching
+from .patches import apply_patch
+from .patches import PatchError
+
+
+_KEYPHRASE_MATCHING_VALUES = frozenset(
+    matching.value
+    for matching in KeyphraseMatching
+)
+STATE_ACTIONS = ('fetch', 'save', 'submit')
+# What became of a draft sent to be saved
+SAVE_SAVED = 'success'
+SAVE_RESYNC = 'resync'
+SAVE_CLOSED = 'closed'
 
 
 #  pylint: disable=no-member
@@ -33,26 +53,84 @@ class FreeTextResponseViewMixin(
     def provide_context(self, context=None):
         """
         Build a context dictionary to render the student view
+
+        Values are LazyValues, read from fields or computed only when
+        the template renders a branch that uses them: with other
+        responses hidden, neither the response pool nor the learner's
+        credit is loaded for them.
         """
         context = context or {}
         context = dict(context)
+        other_responses = LazyValue(self.get_other_answers)
         context.update({
-            'display_name': self.display_name,
+            'autosave': LazyValue(lambda: self.autosave),
+            'display_name': LazyValue(lambda: self.display_name),
+            'indicator_class': LazyValue(self._get_indicator_class),
+            'nodisplay_class': LazyValue(self._get_nodisplay_class),
+            'problem_progress': LazyValue(self._get_problem_progress),
+            'prompt': LazyValue(lambda: self.prompt),
+            'student_answer': LazyValue(lambda: self.student_answer),
+            'student_answer_version': LazyValue(
+                lambda: self.student_answer_version,
+            ),
+            'is_past_due': LazyValue(self.is_past_due),
+            'used_attempts_feedback': LazyValue(
+                self._get_used_attempts_feedback,
+            ),
+            'visibility_class': LazyValue(
+                self._get_indicator_visibility_class,
+            ),
+            'word_count_message': LazyValue(self._get_word_count_message),
+            'display_other_responses': LazyValue(
+                lambda: self.display_other_student_responses,
+            ),
+            'other_responses': other_responses,
+            'state_version': LazyValue(self.get_state_version),
+            'user_alert': '',
+            'submitted_message': '',
+        })
+        return context
+
+    def get_student_state(self, get_other_answers=None):
+        """
+        Returns what the student view shows of the learner's state
+
+        other_responses is None while other responses are hidden, and
+        is drawn with get_other_answers when one is given.
+        """
+        other_responses = None
+        if self.display_other_student_responses:
+            get_other_answers = get_other_answers or self.get_other_answers
+            other_responses = get_other_answers()
+        result = {
             'indicator_class': self._get_indicator_class(),
             'nodisplay_class': self._get_nodisplay_class(),
+            'other_responses': other_responses,
             'problem_progress': self._get_problem_progress(),
-            'prompt': self.prompt,
-            'student_answer': self.student_answer,
-            'is_past_due': self.is_past_due(),
+            'student_answer_version': self.student_answer_version,
             'used_attempts_feedback': self._get_used_attempts_feedback(),
             'visibility_class': self._get_indicator_visibility_class(),
-            'word_count_message': self._get_word_count_message(),
-            'display_other_responses': self.display_other_student_responses,
-            'other_responses': self.get_other_answers(),
-            'user_alert': '',
-            'submitted_message': '',
-        })
-        return context
+        }
+        return result
+
+    def get_fragment_cache_key(self, context=None):
+        """
+        Returns the key to cache the rendered student view under
+
+        Only finished problems, past due or out of attempts, are cached:
+        what they show can then only change with the learner's state,
+        the block's settings or the language, which the state version
+        covers. None is returned for problems still open.
+        """
+        if self._can_submit():
+            return None
+        result = (
+            text_type(self.scope_ids.usage_id),
+            self.get_student_id(),
+            self.is_past_due(),
+            self.get_state_version(),
+        )
+        return result
 
     def _get_indicator_class(self):
         """
@@ -80,8 +158,37 @@ class FreeTextResponseViewMixin(
         Returns a boolean value indicating whether the current
         word count of the user's answer is valid
         """
-        word_count = len(self.student_answer.split())
-        result = self.max_word_count >= word_count >= self.min_word_count
+        return self._get_evaluation().word_count_valid
+
+    def _get_evaluation(self):
+        """
+        Returns the Evaluation of the current answer and settings
+
+        The evaluation is kept on the instance and only rebuilt once
+        the answer or the grading settings change.
+        """
+        key = evaluation_key(
+            self.student_answer,
+            *self._get_grading_settings()
+        )
+        evaluation = getattr(self, '_evaluation', None)
+        if evaluation is None or evaluation.key != key:
+            evaluation = Evaluation(*key)
+            self._evaluation = evaluation
+        return evaluation
+
+    @derived_from_settings()
+    def _get_grading_settings(self):
+        """
+        Returns the settings an Evaluation depends on, in order
+        """
+        result = (
+            self.min_word_count,
+            self.max_word_count,
+            tuple(self.fullcredit_keyphrases),
+            tuple(self.halfcredit_keyphrases),
+            self.keyphrase_matching,
+        )
         return result
 
     def _determine_credit(self):
@@ -94,21 +201,8 @@ class FreeTextResponseViewMixin(
         result = None
         if self.student_answer == '' or not self._word_count_valid():
             result = Credit.zero
-        elif not self.fullcredit_keyphrases \
-                and not self.halfcredit_keyphrases:
-            result = Credit.full
-        elif _is_at_least_one_phrase_present(
-                self.fullcredit_keyphrases,
-                self.student_answer
-        ):
-            result = Credit.full
-        elif _is_at_least_one_phrase_present(
-                self.halfcredit_keyphrases,
-                self.student_answer
-        ):
-            result = Credit.half
         else:
-            result = Credit.zero
+            result = self._get_evaluation().keyphrase_credit
         return result
 
     def _get_problem_progress(self):
@@ -161,6 +255,7 @@ class FreeTextResponseViewMixin(
             )
         return result
 
+    @derived_from_settings()
     def _get_indicator_visibility_class(self):
         """
         Returns the visibility class for the correctness indicator html element
@@ -171,6 +266,7 @@ class FreeTextResponseViewMixin(
             result = 'hidden'
         return result
 
+    @derived_from_settings(by_language=True)
     def _get_word_count_message(self):
         """
         Returns the word count message
@@ -189,34 +285,97 @@ class FreeTextResponseViewMixin(
 
     def get_other_answers(self):
         """
-        Returns at most MAX_RESPONSES answers from the pool.
+        Returns at most max_other_responses answers from the pool.
 
-        Does not return answers the student had submitted.
+        Each student is shown their own sample of the pool, and never
+        the answer they had submitted themselves.
         """
-        student_id = self.get_student_id()
-        display_other_responses = self.display_other_student_responses
-        shouldnt_show_other_responses = not display_other_responses
-        student_answer_incorrect = self._determine_credit() == Credit.zero
-        if student_answer_incorrect or shouldnt_show_other_responses:
+        # Check the setting first: it is cheaper than scoring the answer
+        if not self.display_other_student_responses:
             return []
-        return_list = [
-            response
-            for response in self.displayable_answers
-            if response['student_id'] != student_id
-        ]
-        return_list = return_list[-(MAX_RESPONSES):]
+        if self._determine_credit() == Credit.zero:
+            return []
+        student_id = self.get_student_id()
+        return_list = self.get_response_pool().sample(
+            self.max_other_responses,
+            seed=student_id,
+            exclude=student_id,
+        )
         return return_list
 
     @XBlock.json_handler
-    def submit(self, data, suffix=''):
+    @timed('student_state')
+    def student_state(self, data, suffix=''):
         # pylint: disable=unused-argument
         """
-        Processes the user's submission
+        Saves or submits the learner's answer, or just fetches the state
+
+        data holds the action, one of STATE_ACTIONS, the action's own
+        fields as for save_reponse and submit, and the state_version
+        the client last received. A fetch returns the whole state only
+        when that version is not the current one, and an empty state
+        otherwise, without computing any of it; a submit always returns
+        the whole state, computed once after submitting, and a save
+        only the answer version.
+        """
+        action = data.get('action')
+        if action not in STATE_ACTIONS:
+            raise JsonHandlerError(400, 'Unknown action')
+        if action == 'save':
+            return self._save_state(data)
+        result = {
+            'status': 'success',
+        }
+        if action == 'submit':
+            self._submit_answer(data)
+            result['user_alert'] = self._get_user_alert(ignore_attempts=True)
+            result['submitted_message'] = self._get_submitted_message()
+        version = self.get_state_version()
+        result['state_version'] = version
+        result['state'] = {}
+        if action == 'submit' or data.get('state_version') != version:
+            result['state'] = self.get_student_state()
+        if action == 'fetch' and result['state']:
+            result['student_answer'] = self.student_answer
+        return result
+
+    def _save_state(self, data):
+        """
+        Saves the draft in data, for student_state
+
+        Of the state, a save only changes the answer version, so the
+        rest is not computed again: the client's own state version is
+        returned with just its answer version replaced.
+        """
+        status = self._save_answer(data)
+        result = {
+            'status': status,
+        }
+        if status != SAVE_SAVED:
+            return result
+        answer_version = self.student_answer_version
+        result.update({
+            'state': {
+                'student_answer_version': answer_version,
+            },
+            'state_version': set_answer_version(
+                data.get('state_version'),
+                answer_version,
+            ),
+            'user_alert': self.saved_message,
+            'submitted_message': '',
+        })
+        return result
+
+    def _submit_answer(self, data):
+        """
+        Submits the answer in data, if the learner may still submit
         """
         # Fails if the UI submit/save buttons were shut
         # down on the previous sumbisson
         if self._can_submit():
-            self.student_answer = data['student_answer']
+            self.set_student_answer(data['student_answer'])
+            self.submitted_answer_version = self.student_answer_version
             # Counting the attempts and publishing a score
             # even if word count is invalid.
             self.count_attempts += 1
@@ -224,6 +383,38 @@ class FreeTextResponseViewMixin(
             display_other_responses = self.display_other_student_responses
             if display_other_responses and data.get('can_record_response'):
                 self.store_student_response()
+
+    def _save_answer(self, data):
+        """
+        Saves the draft in data, if the learner may still submit
+
+        Returns SAVE_RESYNC when a patched draft has to be sent whole,
+        and SAVE_CLOSED, saving nothing, once the problem is past due
+        or out of attempts.
+        """
+        # Fails if the UI submit/save buttons were shut
+        # down on the previous sumbisson, or were never shown
+        # because the problem is past due
+        if not self._can_submit():
+            return SAVE_CLOSED
+        if 'patch' in data:
+            try:
+                self._apply_answer_patch(data)
+            except PatchError:
+                incr('answer_patches_rejected')
+                return SAVE_RESYNC
+        else:
+            self.set_student_answer(data['student_answer'])
+        return SAVE_SAVED
+
+    @XBlock.json_handler
+    @timed('submit')
+    def submit(self, data, suffix=''):
+        # pylint: disable=unused-argument
+        """
+        Processes the user's submission
+        """
+        self._submit_answer(data)
         result = {
             'status': 'success',
             'problem_progress': self._get_problem_progress(),
@@ -237,19 +428,31 @@ class FreeTextResponseViewMixin(
             'other_responses': self.get_other_answers(),
             'display_other_responses': self.display_other_student_responses,
             'visibility_class': self._get_indicator_visibility_class(),
+            'student_answer_version': self.student_answer_version,
         }
         return result
 
     @XBlock.json_handler
+    @timed('save_reponse')
     def save_reponse(self, data, suffix=''):
         # pylint: disable=unused-argument
         """
         Processes the user's save
-        """
-        # Fails if the UI submit/save buttons were shut
-        # down on the previous sumbisson
-        if self.max_attempts == 0 or self.count_attempts < self.max_attempts:
-            self.student_answer = data['student_answer']
+
+        Drafts arrive either whole, as student_answer, or as a patch
+        against the answer saved at student_answer_version. A patch for
+        any other version, or one that does not fit, is answered with
+        a resync status, and the client sends the whole answer instead.
+        Drafts for a problem that is closed, past due or out of
+        attempts, are answered with a closed status and not saved.
+        """
+        status = self._save_answer(data)
+        if status != SAVE_SAVED:
+            result = {
+                'status': status,
+                'student_answer_version': self.student_answer_version,
+            }
+            return result
         result = {
             'status': 'success',
             'problem_progress': self._get_problem_progress(),
@@ -258,9 +461,27 @@ class FreeTextResponseViewMixin(
             'submitted_message': '',
             'user_alert': self.saved_message,
             'visibility_class': self._get_indicator_visibility_class(),
+            'student_answer_version': self.student_answer_version,
         }
         return result
 
+    def _apply_answer_patch(self, data):
+        """
+        Apply a draft patch to the saved answer
+
+        Raises PatchError unless the patch was made against the saved
+        version and fits it.
+        """
+        version = self.student_answer_version
+        if data.get('version') != version:
+            raise PatchError('Patch was made against another version')
+        # Reading a String field scans all of it, so read it once
+        saved = self.student_answer
+        answer = apply_patch(saved, data['patch'])
+        if answer != saved:
+            self.student_answer = answer
+            self.student_answer_version = version + 1
+
     def _get_invalid_word_count_message(self, ignore_attempts=False):
         """
         Returns the invalid word count message
@@ -297,6 +518,19 @@ class FreeTextResponseViewMixin(
             result = self._get_invalid_word_count_message(ignore_attempts)
         return result
 
+    @XBlock.handler
+    def submit_studio_edits(self, request, suffix=''):
+        """
+        Saves the settings edited in Studio, then drops the values
+        derived from the old ones
+        """
+        response = super(FreeTextResponseViewMixin, self).submit_studio_edits(
+            request,
+            suffix,
+        )
+        self.reset_settings_values()
+        return response
+
     def _can_submit(self):
         """
         Determine if a user may submit a response
@@ -334,6 +568,16 @@ class FreeTextResponseViewMixin(
                 'Maximum Attempts cannot be negative'
             )
             validation.add(msg)
+        if data.max_other_responses < 0:
+            msg = self._generate_validation_message(
+                'Number of Other Student Responses cannot be negative'
+            )
+            validation.add(msg)
+        if data.response_pool_size < 1:
+            msg = self._generate_validation_message(
+                'Response Pool Size cannot be less than 1'
+            )
+            validation.add(msg)
         if data.min_word_count < 1:
             msg = self._generate_validation_message(
                 'Minimum Word Count cannot be less than 1'
@@ -344,6 +588,11 @@ class FreeTextResponseViewMixin(
                 'Minimum Word Count cannot be greater than Max Word Count'
             )
             validation.add(msg)
+        if data.keyphrase_matching not in _KEYPHRASE_MATCHING_VALUES:
+            msg = self._generate_validation_message(
+                'Key Phrase Matching must be one of the listed options'
+            )
+            validation.add(msg)
         if not data.submitted_message:
             msg = self._generate_validation_message(
                 'Submission Received Message cannot be blank'
@@ -351,14 +600,13 @@ class FreeTextResponseViewMixin(
             validation.add(msg)
 
 
-def _is_at_least_one_phrase_present(phrases, answer):
+def set_answer_version(state_version, answer_version):
     """
-    Determines if at least one of the supplied phrases is
-    present in the given answer
+    Returns a state version with its answer version replaced, or None
+    if state_version is not a state version
     """
-    answer = answer.lower()
-    matches = [
-        phrase.lower() in answer
-        for phrase in phrases
-    ]
-    return any(matches)
+    _old, separator, digests = text_type(state_version).partition('-')
+    if not separator:
+        return None
+    result = '{}-{}'.format(answer_version, digests)
+    return result
@@ -0,0 +1,32 @@
+"""
+Count the words in a student answer
+"""
+from __future__ import absolute_import
+
+
+CHUNK_SIZE = 4096
+
+
+def count_words(text, limit=None):
+    """
+    Count the whitespace-separated words in text
+
+    Equivalent to len(text.split()), but the text is walked in
+    fixed-size chunks, so no list of every word is ever built.
+    When a limit is given, counting stops as soon as it is exceeded
+    and limit + 1 is returned.
+    """
+    count = 0
+    inside_word = False
+    for start in range(0, len(text), CHUNK_SIZE):
+        chunk = text[start:start + CHUNK_SIZE]
+        words = len(chunk.split())
+        if words and inside_word and not chunk[0].isspace():
+            # The first word continues the one the last chunk ended on
+            words -= 1
+        count += words
+        if limit is not None and count > limit:
+            count = limit + 1
+            break
+        inside_word = not chunk[-1].isspace()
+    return count
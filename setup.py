@@ -41,6 +41,8 @@ setup(
     },
     package_data={
         "freetextresponse": [
+            'management/*.py',
+            'management/commands/*.py',
             'mixins/*.py',
             'public/*',
             'scenarios/*.xml',